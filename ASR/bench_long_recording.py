@@ -0,0 +1,90 @@
+"""Peak RSS of long-recording windowing against input duration.
+
+Writes synthetic 16 kHz recordings of increasing length, then in a fresh
+process per run walks them window by window the way the stage workers do
+(memmap), loads them whole as numpy (the floor for holding the recording
+in memory), and splits them the old way, with pydub decoding the whole
+file and exporting WAV chunks. Run with ``python bench_long_recording.py``.
+"""
+import sys
+import json
+import wave
+import resource
+import subprocess
+import tempfile
+from pathlib import Path
+import numpy as np
+
+from pcm import SAMPLE_RATE, pcm_windows
+
+DURATIONS_MIN = [10, 30, 60, 120, 240]
+WINDOW_MS = 10 * 60 * 1000  # same as MAX_CHUNK_DURATION in main.py
+
+
+def write_recording(pcm_path: Path, wav_path: Path, minutes: int):
+    """Write the same synthetic recording as raw PCM and as WAV, block by block so the writer stays small."""
+    rng = np.random.default_rng(0)
+    block = SAMPLE_RATE * 60
+    with open(pcm_path, "wb") as pcm, wave.open(str(wav_path), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        for _ in range(minutes):
+            samples = rng.integers(-3000, 3000, block, dtype=np.int16).tobytes()
+            pcm.write(samples)
+            wav.writeframes(samples)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_mode(mode: str, path: str):
+    if mode == "windowed":
+        for window in pcm_windows(Path(path), WINDOW_MS):
+            samples = window.read()
+            float(np.abs(samples).mean())
+            del samples
+    elif mode == "pydub":
+        # What _split_audio does for recordings below the long-recording threshold
+        from pydub import AudioSegment
+        audio = AudioSegment.from_file(path)
+        with tempfile.TemporaryDirectory() as tmp:
+            for i in range(0, len(audio), WINDOW_MS):
+                audio[i:i + WINDOW_MS].export(Path(tmp) / f"chunk_{i}.wav", format="wav")
+    else:
+        samples = np.fromfile(path, dtype=np.int16).astype(np.float32) / 32768.0
+        float(np.abs(samples).mean())
+    print(json.dumps({"peak_rss_mb": round(peak_rss_mb(), 1)}))
+
+
+def measure(mode: str, path: Path) -> float:
+    output = subprocess.run(
+        [sys.executable, __file__, "--run", mode, str(path)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])["peak_rss_mb"]
+
+
+def main():
+    print(f"{'minutes':>8} {'pcm MB':>8} {'windowed RSS MB':>16} {'in-memory RSS MB':>17} {'pydub RSS MB':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for minutes in DURATIONS_MIN:
+            pcm_path = Path(tmp) / f"{minutes}.pcm"
+            wav_path = Path(tmp) / f"{minutes}.wav"
+            write_recording(pcm_path, wav_path, minutes)
+            size_mb = pcm_path.stat().st_size / (1024 * 1024)
+            windowed = measure("windowed", pcm_path)
+            in_memory = measure("in-memory", pcm_path)
+            pydub = measure("pydub", wav_path)
+            print(f"{minutes:>8} {size_mb:>8.0f} {windowed:>16.1f} {in_memory:>17.1f} {pydub:>13.1f}")
+            pcm_path.unlink()
+            wav_path.unlink()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--run":
+        run_mode(sys.argv[2], sys.argv[3])
+    else:
+        main()
@@ -531,28 +531,48 @@
 
 import os
 from typing import Optional, Dict, List
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks, Request, Response, Query
 from fastapi.responses import JSONResponse, FileResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import uuid
+import hashlib
 import shutil
 from pathlib import Path
 import uvicorn
 from datetime import datetime
 import json
+import time
 import asyncio
+import httpx
 from pydub import AudioSegment
-import torch
 import numpy as np
-from faster_whisper import WhisperModel
-from pyannote.audio import Pipeline
+from stages import (
+    StageConfig,
+    StagePool,
+    StagePipeline,
+    init_transcribe_worker,
+    init_diarize_worker,
+    job_timings,
+)
+from speakers import SpeakerStore, SpeakerTracker
+from pcm import PCMWindow, decode_to_pcm, pcm_windows, probe_duration
 
 # Constants
 UPLOAD_DIR = Path("uploaded_files")
 RESULTS_DIR = Path("transcription_results")
 CHUNK_DIR = Path("audio_chunks")
+SPEAKER_DB = Path("speaker_profiles.db")
 MAX_CHUNK_DURATION = 10 * 60 * 1000  # 10 minutes in milliseconds
-PROCESSING_TIMEOUT = 3600  # 1 hour timeout for processing
+PROCESSING_TIMEOUT = 3600  # 1 hour per stage call, not counting time queued for a worker
+# Recordings at least this long are decoded once to a memory-mapped PCM file instead of split in memory.
+# Compressed size says little about decoded size (Opus is ~1 MB a minute), so this goes by duration.
+LONG_RECORDING_SECONDS = float(os.getenv("ASR_LONG_RECORDING_SECONDS", 20 * 60))
+# Speaker sessions idle this long are forgotten
+SPEAKER_SESSION_TTL = float(os.getenv("ASR_SPEAKER_SESSION_TTL", 3600))
+
+# Stage pool sizing, e.g. ASR_TRANSCRIBE_PROCESSES=2 ASR_TRANSCRIBE_THREADS=4 ASR_TRANSCRIBE_CORES=0-7
+TRANSCRIBE_POOL = StageConfig.from_env("ASR_TRANSCRIBE", processes=1, threads=4)
+DIARIZE_POOL = StageConfig.from_env("ASR_DIARIZE", processes=1, threads=2)
 
 # Create necessary directories
 for dir_path in [UPLOAD_DIR, RESULTS_DIR, CHUNK_DIR]:
@@ -564,6 +584,15 @@ app = FastAPI(title="Audio Transcription API")
 # Store job status
 jobs: Dict[str, Dict] = {}
 
+# Running speakers of meetings sent as several jobs, like a live stream's segments, by session id
+speaker_sessions: Dict[str, SpeakerTracker] = {}
+
+def speaker_session(session_id: str) -> SpeakerTracker:
+    now = time.time()
+    for stale in [key for key, tracker in speaker_sessions.items() if now - tracker.last_used > SPEAKER_SESSION_TTL]:
+        del speaker_sessions[stale]
+    return speaker_sessions.setdefault(session_id, SpeakerTracker())
+
 class TranscriptionJob(BaseModel):
     job_id: str
     status: str
@@ -575,11 +604,30 @@ class TranscriptionJob(BaseModel):
     progress: Optional[float] = 0.0
     total_chunks: Optional[int] = None
     processed_chunks: Optional[int] = 0
+    result_size: Optional[int] = None
+    result_sha256: Optional[str] = None
+    callback_url: Optional[str] = None
+    trace_id: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
+
+class BulkStatusRequest(BaseModel):
+    job_ids: Optional[List[str]] = None
+    status: Optional[str] = None
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+    offset: int = Field(0, ge=0)
+    limit: int = Field(500, ge=1, le=5000)
 
 class SpeakerAwareTranscriber:
-    def __init__(self, hf_token: str, model_size: str = "tiny"):
+    def __init__(self, hf_token: str, model_size: str = "tiny",
+                 transcribe_pool: Optional[StageConfig] = None,
+                 diarize_pool: Optional[StageConfig] = None,
+                 speaker_store: Optional[SpeakerStore] = None):
         self.hf_token = hf_token
         self.model_size = model_size
+        self.speaker_store = speaker_store
+        self.transcribe_pool = transcribe_pool or StageConfig()
+        self.diarize_pool = diarize_pool or StageConfig()
         self._initialize_models()
     
     def _setup_device(self) -> str:
@@ -588,19 +636,16 @@ class SpeakerAwareTranscriber:
 
     def _initialize_models(self):
         try:
-            # Force CPU initialization for diarization
-            self.diarization = Pipeline.from_pretrained(
-                "pyannote/speaker-diarization-3.0",
-                use_auth_token=self.hf_token
-            ).to(torch.device("cpu"))
-
-            # Force CPU initialization for whisper
-            self.transcriber = WhisperModel(
-                self.model_size,
-                device="cpu",
-                compute_type="float32"  # Use float32 for CPU
+            # Whisper and diarization run in separate, independently sized process pools
+            self.pipeline = StagePipeline(
+                transcribe=StagePool("transcribe", self.transcribe_pool,
+                                     init_transcribe_worker, (self.model_size,)),
+                diarize=StagePool("diarize", self.diarize_pool,
+                                  init_diarize_worker, (self.hf_token,)),
+                speaker_store=self.speaker_store,
+                timeout=PROCESSING_TIMEOUT
             )
-            print("Models initialized successfully on CPU")
+            print(f"Stage pools started: transcribe={self.transcribe_pool}, diarize={self.diarize_pool}")
         except Exception as e:
             raise RuntimeError(f"Failed to initialize models: {str(e)}")
 
@@ -617,61 +662,41 @@ class SpeakerAwareTranscriber:
         
         return chunks
 
-    async def process_chunk(self, chunk_path: str, min_speakers: int = 1, max_speakers: int = 5):
+    def _window_audio(self, audio_path: str) -> List[PCMWindow]:
+        """Decode once to PCM on disk and describe chunks as windows into it."""
+        pcm_path = decode_to_pcm(audio_path, CHUNK_DIR / f"{Path(audio_path).stem}.pcm")
+        return pcm_windows(pcm_path, MAX_CHUNK_DURATION)
+
+    async def process_chunk(self, chunk_path: str, min_speakers: int = 1, max_speakers: int = 5,
+                            client_id: Optional[str] = None, tracker: Optional[SpeakerTracker] = None):
         """Process a single audio chunk."""
         try:
-            # Transcribe
-            segments, _ = self.transcriber.transcribe(
-                str(chunk_path),
-                beam_size=5,
-                vad_filter=True,
-                vad_parameters=dict(min_silence_duration_ms=500)
-            )
-            transcript_segments = list(segments)
-
-            # Diarize
-            diarization_result = self.diarization(
-                str(chunk_path),
-                min_speakers=min_speakers,
-                max_speakers=max_speakers
-            )
-
-            # Create speaker mapping
-            speaker_mapping = {}
-            for turn, _, speaker in diarization_result.itertracks(yield_label=True):
-                speaker_mapping[(turn.start, turn.end)] = speaker
-
-            # Combine results
-            final_segments = []
-            for seg in transcript_segments:
-                speaker = "UNKNOWN"
-                for (start, end), spk in speaker_mapping.items():
-                    if (seg.start >= start and seg.end <= end) or \
-                       (seg.start <= start and seg.end >= end) or \
-                       (seg.start <= start and seg.end >= start) or \
-                       (seg.start <= end and seg.end >= end):
-                        speaker = spk
-                        break
-
-                segment_dict = {
-                    "start": seg.start,
-                    "end": seg.end,
-                    "speaker": speaker,
-                    "text": seg.text,
-                    "words": [{"text": word.word, "start": word.start, "end": word.end} 
-                             for word in seg.words] if seg.words else []
-                }
-                final_segments.append(segment_dict)
-
-            return final_segments
-
+            return await self.pipeline.run_chunk(chunk_path, min_speakers, max_speakers, client_id, tracker)
+        except asyncio.TimeoutError:
+            raise
         except Exception as e:
             raise RuntimeError(f"Chunk processing error: {str(e)}")
 
-    async def process_audio(self, audio_path: str, job_id: str, min_speakers: int = 1, max_speakers: int = 5):
+    async def _process_indexed_chunk(self, index: int, chunk_path: Path, min_speakers: int, max_speakers: int,
+                                     client_id: Optional[str] = None, tracker: Optional[SpeakerTracker] = None):
         try:
-            # Split audio into chunks
-            chunks = self._split_audio(audio_path)
+            segments = await self.process_chunk(chunk_path, min_speakers, max_speakers, client_id, tracker)
+        except asyncio.TimeoutError:
+            raise RuntimeError(f"Processing timeout for chunk {index}")
+        return index, segments
+
+    async def process_audio(self, audio_path: str, job_id: str, min_speakers: int = 1, max_speakers: int = 5,
+                            client_id: Optional[str] = None, tracker: Optional[SpeakerTracker] = None):
+        try:
+            # Split audio into chunks; long recordings are windowed from a memory map instead
+            duration = probe_duration(audio_path)
+            # MediaRecorder webm often carries no duration; windowing is safe for any length
+            long_recording = duration is None or duration >= LONG_RECORDING_SECONDS
+            split_started = time.time()
+            chunks = self._window_audio(audio_path) if long_recording else self._split_audio(audio_path)
+            timings = job_timings.get()
+            if timings is not None:
+                timings["split"] = time.time() - split_started
             
             # Update job with total chunks
             jobs[job_id].update({
@@ -679,41 +704,46 @@ class SpeakerAwareTranscriber:
                 "processed_chunks": 0
             })
 
-            # Process chunks with timeout
-            all_segments = []
-            time_offset = 0
-            
-            for i, chunk_path in enumerate(chunks):
-                try:
-                    segments = await asyncio.wait_for(
-                        self.process_chunk(chunk_path, min_speakers, max_speakers),
-                        timeout=PROCESSING_TIMEOUT
-                    )
-                    
+            # Chunks are diarized separately; the tracker carries each speaker's label from chunk to chunk
+            tracker = tracker or SpeakerTracker()
+            # Hand every chunk to the pipeline so both stage pools stay busy
+            tasks = [
+                asyncio.create_task(self._process_indexed_chunk(i, chunk_path, min_speakers, max_speakers,
+                                                                client_id, tracker))
+                for i, chunk_path in enumerate(chunks)
+            ]
+            results = {}
+            try:
+                for task in asyncio.as_completed(tasks):
+                    i, segments = await task
+
                     # Adjust timestamps
+                    time_offset = i * MAX_CHUNK_DURATION / 1000  # Convert ms to seconds
                     for seg in segments:
                         seg["start"] += time_offset
                         seg["end"] += time_offset
                         for word in seg["words"]:
                             word["start"] += time_offset
                             word["end"] += time_offset
-                    
-                    all_segments.extend(segments)
-                    
+                    results[i] = segments
+
                     # Update progress
                     jobs[job_id].update({
-                        "processed_chunks": i + 1,
-                        "progress": round((i + 1) / len(chunks) * 100, 2)
+                        "processed_chunks": len(results),
+                        "progress": round(len(results) / len(chunks) * 100, 2)
                     })
-                    
+
                     # Clean up chunk file
-                    chunk_path.unlink()
-                
-                except asyncio.TimeoutError:
-                    raise RuntimeError(f"Processing timeout for chunk {i}")
-                
-                time_offset += MAX_CHUNK_DURATION / 1000  # Convert ms to seconds
+                    if not long_recording:
+                        chunks[i].unlink()
+            except Exception:
+                for task in tasks:
+                    task.cancel()
+                raise
 
+            all_segments = []
+            for i in range(len(chunks)):
+                all_segments.extend(results[i])
             return all_segments
 
         except Exception as e:
@@ -721,22 +751,41 @@ class SpeakerAwareTranscriber:
             for chunk in CHUNK_DIR.glob(f"*_{Path(audio_path).stem}.wav"):
                 chunk.unlink(missing_ok=True)
             raise RuntimeError(f"Processing error: {str(e)}")
-
-async def process_audio_file(job_id: str, file_path: str):
+        finally:
+            (CHUNK_DIR / f"{Path(audio_path).stem}.pcm").unlink(missing_ok=True)
+
+def speaker_bounds(attendees: Optional[List[str]]):
+    """Narrow the clustering search to the known attendee count, allowing one guest."""
+    if not attendees:
+        return 1, 5
+    return 1, len(attendees) + 1
+
+async def process_audio_file(job_id: str, file_path: str, client_id: Optional[str] = None,
+                             attendees: Optional[List[str]] = None, session_id: Optional[str] = None):
+    # Chunk tasks inherit this dict, so the stage pools add this job's time to it
+    timings = {}
+    job_timings.set(timings)
+    started = time.time()
     try:
         # Process the audio
-        segments = await transcriber.process_audio(file_path, job_id)
+        min_speakers, max_speakers = speaker_bounds(attendees)
+        tracker = speaker_session(session_id) if session_id else None
+        segments = await transcriber.process_audio(file_path, job_id, min_speakers, max_speakers,
+                                                   client_id, tracker)
         
         # Save results
         result_file = RESULTS_DIR / f"{job_id}_transcript.json"
-        with open(result_file, 'w', encoding='utf-8') as f:
-            json.dump(segments, f, ensure_ascii=False, indent=2)
+        result_bytes = json.dumps(segments, ensure_ascii=False, indent=2).encode('utf-8')
+        with open(result_file, 'wb') as f:
+            f.write(result_bytes)
         
         # Update job status
         jobs[job_id].update({
             "status": "completed",
             "completed_at": datetime.now().isoformat(),
             "result_file": str(result_file),
+            "result_size": len(result_bytes),
+            "result_sha256": hashlib.sha256(result_bytes).hexdigest(),
             "progress": 100
         })
         
@@ -747,15 +796,47 @@ async def process_audio_file(job_id: str, file_path: str):
             "error": str(e)
         })
     finally:
+        timings["process"] = time.time() - started
+        jobs[job_id]["timings"] = {name: round(seconds, 3) for name, seconds in timings.items()}
+        print(f"Job {job_id} trace={jobs[job_id].get('trace_id')} timings={jobs[job_id]['timings']}")
         # Clean up original file
         Path(file_path).unlink(missing_ok=True)
+        if jobs[job_id].get("callback_url"):
+            await notify_callback(jobs[job_id])
+
+async def notify_callback(job: Dict, retries: int = 3):
+    """POST the final job status to the callback URL registered at upload, best effort."""
+    async with httpx.AsyncClient(timeout=10) as client:
+        for attempt in range(retries):
+            try:
+                response = await client.post(job["callback_url"], json=job)
+                if response.status_code < 500:
+                    return
+            except httpx.HTTPError as e:
+                print(f"Callback for job {job['job_id']} failed: {e}")
+            await asyncio.sleep(2 ** attempt)
 
 # Initialize transcriber with CPU
 HF_TOKEN = ""  # Replace with your token
-transcriber = SpeakerAwareTranscriber(hf_token=HF_TOKEN, model_size="tiny")
+transcriber = SpeakerAwareTranscriber(
+    hf_token=HF_TOKEN,
+    model_size="tiny",
+    transcribe_pool=TRANSCRIBE_POOL,
+    diarize_pool=DIARIZE_POOL,
+    speaker_store=SpeakerStore(SPEAKER_DB)
+)
 
 @app.post("/upload/", response_model=TranscriptionJob)
-async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
+async def upload_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    client_id: Optional[str] = Form(None),
+    attendees: Optional[str] = Form(None),
+    callback_url: Optional[str] = Form(None),
+    trace_id: Optional[str] = Form(None),
+    session_id: Optional[str] = Form(None)
+):
     try:
         # Generate job ID
         job_id = str(uuid.uuid4())
@@ -771,12 +852,17 @@ async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File
             status="processing",
             created_at=datetime.now().isoformat(),
             file_name=file.filename,
-            progress=0
+            progress=0,
+            callback_url=callback_url,
+            # Correlates this job with the caller's trace
+            trace_id=trace_id or request.headers.get("X-Trace-Id")
         )
         jobs[job_id] = job.dict()
         
         # Process in background
-        background_tasks.add_task(process_audio_file, job_id, str(file_path))
+        attendee_list = [name.strip() for name in attendees.split(",") if name.strip()] if attendees else None
+        # Jobs sharing a session_id, such as the segments of one live meeting, share speaker labels
+        background_tasks.add_task(process_audio_file, job_id, str(file_path), client_id, attendee_list, session_id)
         
         return job
         
@@ -789,6 +875,103 @@ async def get_job_status(job_id: str):
         raise HTTPException(status_code=404, detail="Job not found")
     return jobs[job_id]
 
+def _filter_jobs(query: BulkStatusRequest) -> List[Dict]:
+    """Select jobs by id list and/or status and creation time window, in creation order."""
+    if query.job_ids:
+        selected = [jobs[job_id] for job_id in query.job_ids if job_id in jobs]
+    else:
+        selected = list(jobs.values())
+    if query.status:
+        selected = [job for job in selected if job["status"] == query.status]
+    # ISO timestamps compare correctly as strings
+    if query.created_after:
+        selected = [job for job in selected if job["created_at"] >= query.created_after]
+    if query.created_before:
+        selected = [job for job in selected if job["created_at"] < query.created_before]
+    return selected
+
+def _paged_response(request: Request, query: BulkStatusRequest, rows: List[Dict], total: int) -> Response:
+    """Wrap a page of rows with pagination info and honour If-None-Match."""
+    next_offset = query.offset + len(rows)
+    body = {
+        "rows": rows,
+        "total": total,
+        "next_offset": next_offset if next_offset < total else None
+    }
+    etag = '"' + hashlib.sha256(json.dumps(body, sort_keys=True).encode('utf-8')).hexdigest()[:32] + '"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return JSONResponse(body, headers={"ETag": etag})
+
+def _bulk_status(request: Request, query: BulkStatusRequest) -> Response:
+    selected = _filter_jobs(query)
+    page = selected[query.offset:query.offset + query.limit]
+    rows = [
+        {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "progress": job.get("progress"),
+            "created_at": job["created_at"],
+            "completed_at": job.get("completed_at"),
+            "error": job.get("error")
+        }
+        for job in page
+    ]
+    return _paged_response(request, query, rows, len(selected))
+
+def _result_manifest(request: Request, query: BulkStatusRequest) -> Response:
+    query.status = "completed"
+    selected = _filter_jobs(query)
+    page = selected[query.offset:query.offset + query.limit]
+    rows = [
+        {
+            "job_id": job["job_id"],
+            "file_name": job["file_name"],
+            "completed_at": job.get("completed_at"),
+            "size": job.get("result_size"),
+            "sha256": job.get("result_sha256"),
+            "download_url": f"/download/{job['job_id']}"
+        }
+        for job in page
+    ]
+    return _paged_response(request, query, rows, len(selected))
+
+@app.get("/jobs/status")
+async def get_bulk_status(
+    request: Request,
+    job_ids: Optional[List[str]] = Query(None),
+    status: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000)
+):
+    query = BulkStatusRequest(job_ids=job_ids, status=status, created_after=created_after,
+                              created_before=created_before, offset=offset, limit=limit)
+    return _bulk_status(request, query)
+
+@app.post("/jobs/status")
+async def post_bulk_status(request: Request, query: BulkStatusRequest):
+    # POST form for id lists too long for a query string
+    return _bulk_status(request, query)
+
+@app.get("/jobs/manifest")
+async def get_result_manifest(
+    request: Request,
+    job_ids: Optional[List[str]] = Query(None),
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000)
+):
+    query = BulkStatusRequest(job_ids=job_ids, created_after=created_after,
+                              created_before=created_before, offset=offset, limit=limit)
+    return _result_manifest(request, query)
+
+@app.post("/jobs/manifest")
+async def post_result_manifest(request: Request, query: BulkStatusRequest):
+    return _result_manifest(request, query)
+
 @app.get("/download/{job_id}")
 async def download_transcript(job_id: str):
     if job_id not in jobs:
@@ -808,6 +991,43 @@ async def download_transcript(job_id: str):
         media_type="application/json"
     )
 
+@app.post("/speakers/{client_id}/enroll")
+async def enroll_speakers(client_id: str, file: UploadFile = File(...), segments: str = Form(...)):
+    """Enroll speakers from labelled segments, e.g. [{"start": 1.0, "end": 6.5, "speaker": "Asha"}]."""
+    try:
+        labelled = json.loads(segments)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid segments JSON format")
+
+    file_path = UPLOAD_DIR / f"enroll_{uuid.uuid4()}_{file.filename}"
+    try:
+        with file_path.open("wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+        enrolled = await transcriber.pipeline.enroll(client_id, str(file_path), labelled)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        file_path.unlink(missing_ok=True)
+    return {"client_id": client_id, "enrolled": enrolled}
+
+@app.get("/speakers/{client_id}")
+async def list_speakers(client_id: str):
+    return {"client_id": client_id, "speakers": transcriber.speaker_store.speakers(client_id)}
+
+@app.delete("/speakers/{client_id}/{name}")
+async def remove_speaker(client_id: str, name: str):
+    if not transcriber.speaker_store.remove(client_id, name):
+        raise HTTPException(status_code=404, detail="Speaker not found")
+    return {"client_id": client_id, "removed": name}
+
+@app.get("/metrics/stages")
+async def stage_metrics():
+    return transcriber.pipeline.metrics()
+
+@app.on_event("shutdown")
+async def shutdown_pools():
+    transcriber.pipeline.shutdown()
+
 @app.get("/")
 async def root():
     return {"message": "Audio Transcription API is running"}
@@ -0,0 +1,68 @@
+import os
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+import numpy as np
+from pydantic import BaseModel
+
+SAMPLE_RATE = 16000  # Whisper and pyannote both work at 16 kHz mono
+BYTES_PER_SAMPLE = 2  # s16le
+
+
+class PCMWindow(BaseModel):
+    """A slice of a decoded PCM file; cheap to send to a worker process."""
+    path: str
+    offset: int
+    length: int
+    sample_rate: int = SAMPLE_RATE
+
+    def read(self) -> np.ndarray:
+        """Map just this window and return it as float32 in [-1, 1]."""
+        samples = np.memmap(self.path, dtype=np.int16, mode="r",
+                            offset=self.offset * BYTES_PER_SAMPLE, shape=(self.length,))
+        return samples.astype(np.float32) / 32768.0
+
+    @property
+    def duration(self) -> float:
+        return self.length / self.sample_rate
+
+
+def probe_duration(audio_path: str) -> Optional[float]:
+    """Duration in seconds from the container header, or None when ffprobe cannot tell."""
+    result = subprocess.run(
+        [
+            "ffprobe", "-v", "error", "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1", str(audio_path)
+        ],
+        capture_output=True, text=True
+    )
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def decode_to_pcm(audio_path: str, pcm_path: Path, sample_rate: int = SAMPLE_RATE) -> Path:
+    """Stream-decode any input ffmpeg understands into raw mono s16le without holding it in memory."""
+    subprocess.run(
+        [
+            "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+            "-i", str(audio_path),
+            "-f", "s16le", "-acodec", "pcm_s16le",
+            "-ac", "1", "-ar", str(sample_rate),
+            str(pcm_path)
+        ],
+        check=True
+    )
+    return Path(pcm_path)
+
+
+def pcm_windows(pcm_path: Path, window_ms: int, sample_rate: int = SAMPLE_RATE) -> List[PCMWindow]:
+    """Cut a PCM file into fixed-length windows without reading it."""
+    total = os.path.getsize(pcm_path) // BYTES_PER_SAMPLE
+    step = int(window_ms * sample_rate / 1000)
+    return [
+        PCMWindow(path=str(pcm_path), offset=offset,
+                  length=min(step, total - offset), sample_rate=sample_rate)
+        for offset in range(0, total, step)
+    ]
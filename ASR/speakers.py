@@ -0,0 +1,176 @@
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+# Minimum cosine similarity for a diarized cluster to take an enrolled name
+MATCH_THRESHOLD = 0.65
+# Minimum cosine similarity for a chunk's cluster to continue a speaker from earlier chunks
+LINK_THRESHOLD = 0.5
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def _greedy_match(similarity: np.ndarray, threshold: float) -> List[Tuple[int, int]]:
+    """Pair rows with columns, best pairs first, each used at most once."""
+    pairs = []
+    rows, columns = set(), set()
+    for flat in np.argsort(similarity, axis=None)[::-1]:
+        i, j = np.unravel_index(flat, similarity.shape)
+        if similarity[i, j] < threshold:
+            break
+        if i in rows or j in columns:
+            continue
+        pairs.append((int(i), int(j)))
+        rows.add(i)
+        columns.add(j)
+    return pairs
+
+
+class SpeakerStore:
+    """Per-client store of enrolled speaker embeddings backed by SQLite."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS speakers (
+                client_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                samples INTEGER NOT NULL,
+                PRIMARY KEY (client_id, name)
+            )"""
+        )
+        self._conn.commit()
+        # client_id -> (names, normalized embedding matrix)
+        self._cache: Dict[str, Tuple[List[str], np.ndarray]] = {}
+
+    def _load(self, client_id: str) -> Tuple[List[str], np.ndarray]:
+        if client_id not in self._cache:
+            rows = self._conn.execute(
+                "SELECT name, embedding FROM speakers WHERE client_id = ? ORDER BY name",
+                (client_id,)
+            ).fetchall()
+            names = [name for name, _ in rows]
+            if rows:
+                matrix = _normalize(np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows]))
+            else:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+            self._cache[client_id] = (names, matrix)
+        return self._cache[client_id]
+
+    def speakers(self, client_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, samples FROM speakers WHERE client_id = ? ORDER BY name",
+                (client_id,)
+            ).fetchall()
+        return [{"name": name, "samples": samples} for name, samples in rows]
+
+    def enroll(self, client_id: str, samples: List[Tuple[str, List[float]]]) -> List[str]:
+        """Fold labelled embeddings into each speaker's running mean."""
+        grouped: Dict[str, List[np.ndarray]] = {}
+        for name, embedding in samples:
+            vector = np.asarray(embedding, dtype=np.float32)
+            if np.isfinite(vector).all():
+                grouped.setdefault(name, []).append(vector)
+
+        with self._lock:
+            for name, vectors in grouped.items():
+                row = self._conn.execute(
+                    "SELECT embedding, samples FROM speakers WHERE client_id = ? AND name = ?",
+                    (client_id, name)
+                ).fetchone()
+                total = np.sum(vectors, axis=0)
+                count = len(vectors)
+                if row:
+                    previous = np.frombuffer(row[0], dtype=np.float32)
+                    total = total + previous * row[1]
+                    count += row[1]
+                mean = (total / count).astype(np.float32)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO speakers (client_id, name, embedding, samples) VALUES (?, ?, ?, ?)",
+                    (client_id, name, mean.tobytes(), count)
+                )
+            self._conn.commit()
+            self._cache.pop(client_id, None)
+        return sorted(grouped)
+
+    def remove(self, client_id: str, name: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM speakers WHERE client_id = ? AND name = ?", (client_id, name)
+            )
+            self._conn.commit()
+            self._cache.pop(client_id, None)
+        return cursor.rowcount > 0
+
+    def identify(self, client_id: str, centroids: Dict[str, List[float]],
+                 threshold: float = MATCH_THRESHOLD) -> Dict[str, str]:
+        """Map diarization labels to enrolled names; each name is used at most once."""
+        with self._lock:
+            names, matrix = self._load(client_id)
+        labels = [label for label, vector in centroids.items() if np.isfinite(vector).all()]
+        if not names or not labels:
+            return {}
+
+        queries = _normalize(np.asarray([centroids[label] for label in labels], dtype=np.float32))
+        return {labels[i]: names[j] for i, j in _greedy_match(queries @ matrix.T, threshold)}
+
+    def count(self, client_id: str) -> int:
+        with self._lock:
+            names, _ = self._load(client_id)
+        return len(names)
+
+
+class SpeakerTracker:
+    """Keeps diarization labels stable across chunks that were diarized separately.
+
+    pyannote clusters each chunk on its own, so SPEAKER_00 in one chunk need
+    not be SPEAKER_00 in the next. link() matches a chunk's centroids to the
+    running mean embedding of every speaker seen so far and starts a new
+    speaker when none is close enough. Used from the event loop only.
+    """
+
+    def __init__(self, threshold: float = LINK_THRESHOLD):
+        self.threshold = threshold
+        self.labels: List[str] = []
+        # Sum of each speaker's normalized centroids; its direction is their mean
+        self._sums: List[Optional[np.ndarray]] = []
+        self.last_used = time.time()
+
+    def _new_speaker(self, vector: Optional[np.ndarray]) -> str:
+        label = f"SPEAKER_{len(self.labels):02d}"
+        self.labels.append(label)
+        self._sums.append(vector)
+        return label
+
+    def link(self, labels: List[str], centroids: Dict[str, List[float]]) -> Dict[str, str]:
+        """Map a chunk's labels to stable ones; labels without a usable centroid get new speakers."""
+        self.last_used = time.time()
+        known = [label for label in labels if label in centroids and np.isfinite(centroids[label]).all()]
+        tracked = [j for j, total in enumerate(self._sums) if total is not None]
+        mapping = {}
+        if known:
+            queries = _normalize(np.asarray([centroids[label] for label in known], dtype=np.float32))
+            if tracked:
+                similarity = queries @ _normalize(np.stack([self._sums[j] for j in tracked])).T
+                for i, j in _greedy_match(similarity, self.threshold):
+                    speaker = tracked[j]
+                    mapping[known[i]] = self.labels[speaker]
+                    self._sums[speaker] = self._sums[speaker] + queries[i]
+            for i, label in enumerate(known):
+                if label not in mapping:
+                    mapping[label] = self._new_speaker(queries[i])
+        for label in labels:
+            if label not in mapping:
+                # Nothing to compare later chunks against, so this speaker is never continued
+                mapping[label] = self._new_speaker(None)
+        return mapping
@@ -0,0 +1,298 @@
+import os
+import time
+import asyncio
+import contextvars
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Dict, List, Tuple, Union
+from pydantic import BaseModel
+from pcm import PCMWindow
+
+# A chunk is either a chunk file on disk or a window into a decoded PCM file
+ChunkAudio = Union[str, PCMWindow]
+
+# Seconds each stage spent on the current job, summed over its chunks; set per job task
+job_timings: contextvars.ContextVar = contextvars.ContextVar("job_timings", default=None)
+
+# Models live in the worker processes, one per process
+_transcriber = None
+_diarizer = None
+
+
+class StageConfig(BaseModel):
+    processes: int = 1
+    threads: int = 1
+    cores: Optional[List[int]] = None
+
+    @classmethod
+    def from_env(cls, prefix: str, processes: int = 1, threads: int = 1) -> "StageConfig":
+        """Read ``<prefix>_PROCESSES``, ``<prefix>_THREADS`` and ``<prefix>_CORES`` from the environment."""
+        cores = os.getenv(f"{prefix}_CORES")
+        return cls(
+            processes=int(os.getenv(f"{prefix}_PROCESSES", processes)),
+            threads=int(os.getenv(f"{prefix}_THREADS", threads)),
+            cores=parse_cores(cores) if cores else None,
+        )
+
+
+def parse_cores(spec: str) -> List[int]:
+    """Parse a core list such as ``0-3,6`` into ``[0, 1, 2, 3, 6]``."""
+    cores = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            cores.extend(range(int(first), int(last) + 1))
+        else:
+            cores.append(int(part))
+    return sorted(set(cores))
+
+
+def _apply_limits(threads: int, cores: Optional[List[int]]):
+    """Pin the current worker to its stage's cores and cap its thread count."""
+    import torch
+
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+
+
+def init_transcribe_worker(model_size: str, threads: int, cores: Optional[List[int]]):
+    global _transcriber
+    from faster_whisper import WhisperModel
+
+    _apply_limits(threads, cores)
+    _transcriber = WhisperModel(
+        model_size,
+        device="cpu",
+        compute_type="float32",
+        cpu_threads=threads
+    )
+    print(f"Whisper worker {os.getpid()} ready ({threads} threads, cores={cores})")
+
+
+def init_diarize_worker(hf_token: str, threads: int, cores: Optional[List[int]]):
+    global _diarizer
+    import torch
+    from pyannote.audio import Pipeline
+
+    _apply_limits(threads, cores)
+    _diarizer = Pipeline.from_pretrained(
+        "pyannote/speaker-diarization-3.0",
+        use_auth_token=hf_token
+    ).to(torch.device("cpu"))
+    print(f"Diarization worker {os.getpid()} ready ({threads} threads, cores={cores})")
+
+
+def transcribe_chunk(chunk: ChunkAudio):
+    """Transcribe one chunk inside a transcribe worker."""
+    started = time.time()
+    audio = chunk.read() if isinstance(chunk, PCMWindow) else str(chunk)
+    segments, _ = _transcriber.transcribe(
+        audio,
+        beam_size=5,
+        vad_filter=True,
+        vad_parameters=dict(min_silence_duration_ms=500)
+    )
+    result = [
+        {
+            "start": seg.start,
+            "end": seg.end,
+            "text": seg.text,
+            "words": [{"text": word.word, "start": word.start, "end": word.end}
+                      for word in seg.words] if seg.words else []
+        }
+        for seg in segments
+    ]
+    return result, started, time.time()
+
+
+def diarize_chunk(chunk: ChunkAudio, min_speakers: int, max_speakers: int):
+    """Diarize one chunk inside a diarize worker, returning turns and per-speaker centroids."""
+    import torch
+
+    started = time.time()
+    if isinstance(chunk, PCMWindow):
+        audio = {"waveform": torch.from_numpy(chunk.read()).unsqueeze(0), "sample_rate": chunk.sample_rate}
+    else:
+        audio = str(chunk)
+    diarization_result, embeddings = _diarizer(
+        audio,
+        min_speakers=min_speakers,
+        max_speakers=max_speakers,
+        return_embeddings=True
+    )
+    turns = [
+        (turn.start, turn.end, speaker)
+        for turn, _, speaker in diarization_result.itertracks(yield_label=True)
+    ]
+    # Embeddings are ordered like labels()
+    centroids = {
+        label: embeddings[i].tolist()
+        for i, label in enumerate(diarization_result.labels())
+        if embeddings is not None and i < len(embeddings)
+    }
+    return (turns, centroids), started, time.time()
+
+
+def embed_segments(audio_path: str, segments: List[Dict]):
+    """Compute one speaker embedding per labelled segment inside a diarize worker.
+
+    Uses the diarization pipeline's own embedding model and audio loader, so
+    enrolled voices live in the same space as the centroids identify() compares.
+    """
+    from pyannote.core import Segment
+
+    started = time.time()
+    samples = []
+    for seg in segments:
+        waveform, _ = _diarizer._audio.crop(str(audio_path), Segment(seg["start"], seg["end"]))
+        embedding = _diarizer._embedding(waveform[None])
+        samples.append((seg["speaker"], embedding[0].reshape(-1).tolist()))
+    return samples, started, time.time()
+
+
+def assign_speakers(segments: List[Dict], turns: List[Tuple[float, float, str]]) -> List[Dict]:
+    """Label each transcript segment with the first diarization turn it overlaps."""
+    final_segments = []
+    for seg in segments:
+        speaker = "UNKNOWN"
+        for start, end, spk in turns:
+            if (seg["start"] >= start and seg["end"] <= end) or \
+               (seg["start"] <= start and seg["end"] >= end) or \
+               (seg["start"] <= start and seg["end"] >= start) or \
+               (seg["start"] <= end and seg["end"] >= end):
+                speaker = spk
+                break
+        final_segments.append({
+            "start": seg["start"],
+            "end": seg["end"],
+            "speaker": speaker,
+            "text": seg["text"],
+            "words": seg["words"]
+        })
+    return final_segments
+
+
+class StageMetrics:
+    def __init__(self, name: str, processes: int):
+        self.name = name
+        self.processes = processes
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_time = 0.0
+        self.busy_time = 0.0
+        self.started_at = time.time()
+
+    def record(self, submitted: float, started: float, finished: float):
+        self.completed += 1
+        self.wait_time += max(0.0, started - submitted)
+        self.busy_time += max(0.0, finished - started)
+
+    def snapshot(self) -> Dict:
+        in_flight = self.submitted - self.completed - self.failed
+        elapsed = max(time.time() - self.started_at, 1e-6)
+        done = max(self.completed, 1)
+        return {
+            "stage": self.name,
+            "processes": self.processes,
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.processes),
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_s": round(self.wait_time / done, 3),
+            "avg_service_s": round(self.busy_time / done, 3),
+            "utilization": round(self.busy_time / (elapsed * self.processes), 3),
+        }
+
+
+class StagePool:
+    """A process pool dedicated to one pipeline stage.
+
+    At most one call per process is handed to the executor at a time; the
+    rest wait here, so a timeout passed to submit() covers only the time a
+    worker spends on the call, not the time spent queued behind others.
+    """
+
+    def __init__(self, name: str, config: StageConfig, initializer, initargs: tuple):
+        self.name = name
+        self.config = config
+        self.metrics = StageMetrics(name, config.processes)
+        self._slots = asyncio.Semaphore(config.processes)
+        self.executor = ProcessPoolExecutor(
+            max_workers=config.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer,
+            initargs=(*initargs, config.threads, config.cores)
+        )
+
+    async def submit(self, fn, *args, timeout: Optional[float] = None):
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        self.metrics.submitted += 1
+        try:
+            async with self._slots:
+                result, started, finished = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, fn, *args), timeout
+                )
+        except Exception:
+            self.metrics.failed += 1
+            raise
+        self.metrics.record(submitted, started, finished)
+        timings = job_timings.get()
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + (finished - started)
+            timings[f"{self.name}_wait"] = timings.get(f"{self.name}_wait", 0.0) + max(0.0, started - submitted)
+        return result
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class StagePipeline:
+    """Feeds chunks to independent transcribe and diarize pools and merges their output."""
+
+    def __init__(self, transcribe: StagePool, diarize: StagePool, speaker_store=None,
+                 timeout: Optional[float] = None):
+        self.transcribe = transcribe
+        self.diarize = diarize
+        self.speaker_store = speaker_store
+        # Per stage call, counted from when a worker picks it up
+        self.timeout = timeout
+
+    async def run_chunk(self, chunk: ChunkAudio, min_speakers: int = 1, max_speakers: int = 5,
+                        client_id: Optional[str] = None, tracker=None) -> List[Dict]:
+        """Transcribe and diarize one chunk; a SpeakerTracker keeps labels stable across chunks."""
+        # Only the path or window descriptor crosses the process boundary, never the samples
+        if not isinstance(chunk, PCMWindow):
+            chunk = str(chunk)
+        segments, (turns, centroids) = await asyncio.gather(
+            self.transcribe.submit(transcribe_chunk, chunk, timeout=self.timeout),
+            self.diarize.submit(diarize_chunk, chunk, min_speakers, max_speakers, timeout=self.timeout)
+        )
+        labels = list(dict.fromkeys(speaker for _, _, speaker in turns))
+        stable = tracker.link(labels, centroids) if tracker is not None else {}
+        # Swap SPEAKER_xx labels for enrolled names where the voice matches
+        names = {}
+        if client_id and self.speaker_store is not None:
+            names = self.speaker_store.identify(client_id, centroids)
+        turns = [(start, end, names.get(speaker) or stable.get(speaker, speaker)) for start, end, speaker in turns]
+        return assign_speakers(segments, turns)
+
+    async def enroll(self, client_id: str, audio_path: str, segments: List[Dict]) -> List[str]:
+        samples = await self.diarize.submit(embed_segments, str(audio_path), segments)
+        return self.speaker_store.enroll(client_id, samples)
+
+    def metrics(self) -> Dict:
+        stages = [self.transcribe.metrics.snapshot(), self.diarize.metrics.snapshot()]
+        bottleneck = None
+        if any(stage["completed"] for stage in stages):
+            bottleneck = max(stages, key=lambda s: (s["queued"], s["utilization"]))["stage"]
+        return {"stages": stages, "bottleneck": bottleneck}
+
+    def shutdown(self):
+        self.transcribe.shutdown()
+        self.diarize.shutdown()
@@ -0,0 +1,104 @@
+"""BM25 cost as the knowledge base grows: incremental index vs BM25Okapi rebuilds.
+
+For each corpus size this builds a BM25Index over synthetic 50-token chunks
+with a Zipf-like vocabulary, then measures what RAGSystem pays per meeting
+and per query: adding one meeting's worth of chunks (``--meeting-chunks``)
+and a top-3 search. With rank_bm25 installed, the same numbers are taken for
+the old path, a full BM25Okapi rebuild per add and get_scores plus argsort
+per query, up to ``--baseline-max`` chunks, since the rebuild gets slow.
+
+    python bench_bm25.py --sizes 10000 100000 1000000
+"""
+import time
+import argparse
+import statistics
+import numpy as np
+from bm25_index import BM25Index
+
+try:
+    from rank_bm25 import BM25Okapi
+except ImportError:
+    BM25Okapi = None
+
+VOCAB_SIZE = 50000
+CHUNK_TOKENS = 50
+BUILD_BATCH = 10000
+
+
+class Corpus:
+    def __init__(self, seed):
+        self.rng = np.random.default_rng(seed)
+        self.vocab = np.array([f"w{i}" for i in range(VOCAB_SIZE)])
+        weights = 1.0 / np.arange(1, VOCAB_SIZE + 1) ** 1.1
+        self.p = weights / weights.sum()
+
+    def chunks(self, count):
+        ids = self.rng.choice(VOCAB_SIZE, size=(count, CHUNK_TOKENS), p=self.p)
+        return self.vocab[ids].tolist()
+
+    def queries(self, count, length=5):
+        # Skip the head of the distribution, which plays the part of stop words
+        ids = self.rng.integers(100, 20000, size=(count, length))
+        return self.vocab[ids].tolist()
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - started, result
+
+
+def ms(seconds):
+    return round(seconds * 1000, 2)
+
+
+def bench_index(corpus, size, args):
+    index = BM25Index()
+    build = 0.0
+    for start in range(0, size, BUILD_BATCH):
+        elapsed, _ = timed(index.add, corpus.chunks(min(BUILD_BATCH, size - start)))
+        build += elapsed
+
+    meeting = corpus.chunks(args.meeting_chunks)
+    add, _ = timed(index.add, meeting)
+    queries = [timed(index.top_k, q, 3)[0] for q in corpus.queries(args.queries)]
+    return {"build_s": round(build, 2), "add_meeting_ms": ms(add),
+            "query_p50_ms": ms(statistics.median(queries)), "query_max_ms": ms(max(queries))}
+
+
+def bench_baseline(corpus, size, args):
+    tokenized = corpus.chunks(size)
+    tokenized.extend(corpus.chunks(args.meeting_chunks))
+    # What add_text used to do: rebuild over everything, new chunks included
+    add, bm25 = timed(BM25Okapi, tokenized)
+
+    def search(query):
+        scores = bm25.get_scores(query)
+        return np.argsort(scores)[-3:][::-1]
+
+    queries = [timed(search, q)[0] for q in corpus.queries(min(args.queries, 20))]
+    return {"add_meeting_ms": ms(add), "query_p50_ms": ms(statistics.median(queries)),
+            "query_max_ms": ms(max(queries))}
+
+
+def main(args):
+    for size in args.sizes:
+        corpus = Corpus(args.seed)
+        print(f"{size} chunks")
+        print(f"  BM25Index:          {bench_index(corpus, size, args)}")
+        if BM25Okapi is None:
+            print("  BM25Okapi rebuild:  skipped, rank_bm25 is not installed")
+        elif size > args.baseline_max:
+            print(f"  BM25Okapi rebuild:  skipped above --baseline-max {args.baseline_max}")
+        else:
+            print(f"  BM25Okapi rebuild:  {bench_baseline(Corpus(args.seed), size, args)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--meeting-chunks", type=int, default=40)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--baseline-max", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,161 @@
+"""Okapi BM25 over an inverted index that grows as chunks are added.
+
+Each term keeps a postings list: the ids of the documents it occurs in and
+its frequency in each, held in numpy arrays that grow by doubling. Adding a
+document only touches the postings of its own terms, and the corpus-wide
+statistics BM25 needs (document count, total length, per-term document
+frequency) are plain counters, so IDF and the average document length are
+always current without revisiting old documents. A query scores only the
+documents in its terms' postings and picks the best with argpartition.
+Removing a document takes its length and terms back out of those counters,
+using the term list kept for each document, and masks it out of results;
+its postings entries stay behind but are never returned.
+"""
+from collections import Counter
+from typing import List, Sequence, Tuple
+import numpy as np
+
+INITIAL_CAPACITY = 4
+
+
+def _grow(array: np.ndarray, size: int, capacity: int) -> np.ndarray:
+    grown = np.empty(capacity, dtype=array.dtype)
+    grown[:size] = array[:size]
+    return grown
+
+
+class _Postings:
+    __slots__ = ("docs", "tfs", "size")
+
+    def __init__(self):
+        self.docs = np.empty(INITIAL_CAPACITY, dtype=np.int32)
+        self.tfs = np.empty(INITIAL_CAPACITY, dtype=np.float32)
+        self.size = 0
+
+    def extend(self, docs: List[int], tfs: List[int]):
+        end = self.size + len(docs)
+        if end > len(self.docs):
+            capacity = max(end, 2 * len(self.docs))
+            self.docs = _grow(self.docs, self.size, capacity)
+            self.tfs = _grow(self.tfs, self.size, capacity)
+        self.docs[self.size:end] = docs
+        self.tfs[self.size:end] = tfs
+        self.size = end
+
+
+class BM25Index:
+    """Incremental BM25 index; document ids are assigned consecutively from 0.
+
+    Uses BM25Okapi's k1 and b. IDF is log(1 + (N - df + 0.5) / (df + 0.5)),
+    which is never negative, so unlike BM25Okapi it needs no floor derived
+    from the average IDF of the whole vocabulary. N, df and the average
+    length count live documents only. Not thread-safe; callers serialise
+    adds, removals and queries.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.df = {}
+        # Distinct terms of each document, so removing it can take them back out of df
+        self.doc_terms = []
+        self.doc_len = np.empty(INITIAL_CAPACITY, dtype=np.float32)
+        self.live = np.empty(INITIAL_CAPACITY, dtype=bool)
+        # Ids handed out so far, and how many of those documents are still live
+        self.num_docs = 0
+        self.live_docs = 0
+        self.total_len = 0
+
+    def __len__(self):
+        return self.live_docs
+
+    def add(self, docs: Sequence[List[str]]) -> range:
+        """Index tokenized documents; costs O(tokens added), not O(corpus). Returns their ids."""
+        start = self.num_docs
+        # Group the batch's postings by term so each term's arrays are extended once
+        batch = {}
+        lengths = []
+        for doc_id, tokens in enumerate(docs, start):
+            lengths.append(len(tokens))
+            counts = Counter(tokens)
+            self.doc_terms.append(tuple(counts))
+            for term, tf in counts.items():
+                entry = batch.get(term)
+                if entry is None:
+                    batch[term] = entry = ([], [])
+                entry[0].append(doc_id)
+                entry[1].append(tf)
+
+        for term, (doc_ids, tfs) in batch.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                self.postings[term] = postings = _Postings()
+            postings.extend(doc_ids, tfs)
+            self.df[term] = self.df.get(term, 0) + len(doc_ids)
+
+        end = start + len(lengths)
+        if end > len(self.doc_len):
+            capacity = max(end, 2 * len(self.doc_len))
+            self.doc_len = _grow(self.doc_len, start, capacity)
+            self.live = _grow(self.live, start, capacity)
+        self.doc_len[start:end] = lengths
+        self.live[start:end] = True
+        self.num_docs = end
+        self.live_docs += len(lengths)
+        self.total_len += sum(lengths)
+        return range(start, end)
+
+    def remove(self, doc_ids: Sequence[int]):
+        """Drop these documents from results and from the corpus statistics; removed ids are skipped."""
+        for doc_id in set(doc_ids):
+            if not self.live[doc_id]:
+                continue
+            self.live[doc_id] = False
+            self.live_docs -= 1
+            self.total_len -= int(self.doc_len[doc_id])
+            for term in self.doc_terms[doc_id]:
+                self.df[term] -= 1
+            self.doc_terms[doc_id] = ()
+
+    def idf(self, term: str) -> float:
+        df = self.df.get(term, 0)
+        return float(np.log1p((self.live_docs - df + 0.5) / (df + 0.5)))
+
+    def scores(self, query_tokens: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc_ids, scores) for the documents containing at least one query term."""
+        doc_ids, contributions = [], []
+        if self.live_docs:
+            # Guarded for a corpus left with only empty documents
+            avgdl = max(self.total_len / self.live_docs, 1e-9)
+            # A repeated query term counts once per occurrence, as in BM25Okapi
+            for term, qtf in Counter(query_tokens).items():
+                postings = self.postings.get(term)
+                if postings is None:
+                    continue
+                docs = postings.docs[:postings.size]
+                tfs = postings.tfs[:postings.size]
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[docs] / avgdl)
+                doc_ids.append(docs)
+                contributions.append(qtf * self.idf(term) * tfs * (self.k1 + 1) / (tfs + norm))
+
+        if not doc_ids:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        if len(doc_ids) == 1:
+            docs, scores = doc_ids[0], contributions[0]
+        else:
+            # Sum each document's contributions across the query terms it matched
+            docs, positions = np.unique(np.concatenate(doc_ids), return_inverse=True)
+            scores = np.bincount(positions, weights=np.concatenate(contributions))
+        live = self.live[docs]
+        return docs[live], scores[live]
+
+    def top_k(self, query_tokens: List[str], k: int) -> List[Tuple[int, float]]:
+        """The k best-scoring (doc_id, score) pairs, best first; only matching documents are returned."""
+        docs, scores = self.scores(query_tokens)
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(int(docs[i]), float(scores[i])) for i in best]
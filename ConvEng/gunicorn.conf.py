@@ -1,4 +1,12 @@
+import os
+
 bind = f"0.0.0.0:3141"
 workers = 1
 worker_class = "uvicorn.workers.UvicornWorker"
-timeout = 120
\ No newline at end of file
+timeout = 120
+
+# RAG_PRELOAD=1 loads the embedding models in the master before forking, so workers share them
+if os.getenv("RAG_PRELOAD") == "1":
+    def when_ready(server):
+        from rag import load_models
+        load_models()
@@ -185,4 +185,8 @@ class ChatConversationMemory(BaseModel):
 
 class ChatConversationInitialization(BaseModel):
     text: str = Field(description="Summary Text")
-    client_id: str = Field(description="Client ID")
\ No newline at end of file
+    client_id: str = Field(description="Client ID")
+    source_id: Optional[str] = Field(
+        description="Meeting key, e.g. its folder path; earlier chunks from the same source are replaced",
+        default=None
+    )
\ No newline at end of file
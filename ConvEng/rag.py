@@ -1,37 +1,80 @@
-from typing import List, Dict, Any
+import os
+import json
+import time
+import fcntl
+import threading
+import functools
+from contextlib import contextmanager
+from typing import List, Dict, Any, Tuple
 from pymilvus import MilvusClient
 from sentence_transformers import SentenceTransformer, CrossEncoder
-from rank_bm25 import BM25Okapi
 import nltk
 from nltk.tokenize import word_tokenize
-import numpy as np
 from pytz import timezone 
 from datetime import datetime
+from bm25_index import BM25Index
+
+# Milvus Lite file, or the URI of a Milvus server shared by several workers on one host
+RAG_DB = os.getenv("RAG_DB", "rag_database.db")
+# Chunk ids are allocated past the last chunk in the collection, so only one process may insert
+# at a time: add_text holds this file lock from reading the collection to inserting, and the file
+# records the next free id. Every process that writes to the collection must run on this host
+RAG_WRITE_LOCK = os.getenv("RAG_WRITE_LOCK", "rag_write.lock")
+# How often a search checks the collection for chunks added by another process
+RAG_REFRESH_SECONDS = float(os.getenv("RAG_REFRESH_SECONDS", 30))
+# Rows fetched per query when loading chunks from the collection
+LOAD_PAGE_SIZE = 10000
+
+
+@contextmanager
+def write_lock():
+    """Hold the collection's single-writer lock across processes; yields the lock file."""
+    with open(RAG_WRITE_LOCK, "a+") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield lock_file
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@functools.lru_cache(maxsize=None)
+def load_models():
+    """Load the sentence encoder and cross-encoder once per process.
+
+    Safe to call before forking, so workers can share the weights.
+    """
+    encoder = SentenceTransformer('sentence-transformers/all-mpnet-base-v2')
+    cross_encoder = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
+
+    # Download required NLTK data
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        nltk.download('punkt')
+    return encoder, cross_encoder
+
 
 class RAGSystem:
-    def __init__(self, db_name: str = "rag_database.db"):
+    def __init__(self, db_name: str = RAG_DB):
         """Initialize RAG system with Milvus Lite and necessary models."""
         # Initialize Milvus client
         self.client = MilvusClient(db_name)
         
         # Initialize models
-        self.encoder = SentenceTransformer('sentence-transformers/all-mpnet-base-v2')
-        self.cross_encoder = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2')
-        
-        # Download required NLTK data
-        try:
-            nltk.data.find('tokenizers/punkt')
-        except LookupError:
-            nltk.download('punkt')
+        self.encoder, self.cross_encoder = load_models()
+
+        # Guards the chunk list and BM25 index; searches and adds can come from any thread
+        self._lock = threading.RLock()
+        self._refreshed_at = 0.0
         
         # Collection settings
         self.collection_name = "rag_collection"
         self.vector_dim = 768  # Dimension of sentence-transformer embeddings
         
-        # Initialize BM25 components
-        self.bm25 = None
+        # Initialize BM25 components; index ids are positions in all_chunks, which are Milvus ids.
+        # Deleted chunks stay behind as None so the positions keep lining up
+        self.bm25 = BM25Index()
         self.all_chunks = []
-        self.tokenized_chunks = []
         
         # Create collection if it doesn't exist
         self._ensure_collection_exists()
@@ -51,34 +94,88 @@ class RAGSystem:
 
     def _load_existing_data(self):
         """Load existing data from collection into BM25 index."""
-        if self.client.has_collection(self.collection_name):
-            try:
-                count_query = self.client.query(
-                    collection_name=self.collection_name,
-                    filter="",
-                    output_fields=["count(*)"],
-                    limit=1
-                )
-                
-                if count_query and count_query[0]['count(*)'] > 0:
-                    existing_data = self.client.query(
-                        collection_name=self.collection_name,
-                        filter="",
-                        output_fields=["text"],
-                        limit=count_query[0]['count(*)']
-                    )
-                    
-                    if existing_data:
-                        for item in existing_data:
-                            text = item['text']
-                            self.all_chunks.append(text)
-                            self.tokenized_chunks.append(word_tokenize(text.lower()))
-                        
-                        self.bm25 = BM25Okapi(self.tokenized_chunks)
-                        print(f"Loaded {len(self.all_chunks)} existing chunks from the database")
-            except Exception as e:
-                print(f"Error loading existing data: {str(e)}")
-                self.bm25 = BM25Okapi([[]])
+        try:
+            self.refresh(force=True)
+            print(f"Loaded {len(self.all_chunks)} existing chunks from the database")
+        except Exception as e:
+            print(f"Error loading existing data: {str(e)}")
+
+    def _count_from(self, start_id: int) -> int:
+        # Strong reads see every insert that has returned, including another writer's last one
+        rows = self.client.query(
+            collection_name=self.collection_name,
+            filter=f"id >= {start_id}",
+            output_fields=["count(*)"],
+            consistency_level="Strong"
+        )
+        return rows[0]['count(*)'] if rows else 0
+
+    def _fetch_chunks(self, start_id: int) -> List[Tuple[int, str]]:
+        """(id, text) of the chunks with id >= start_id, in id order.
+
+        Replaced meetings leave gaps in the ids, so a short page does not mean
+        the end; paging stops once nothing is left past the current page.
+        """
+        chunks = []
+        while self._count_from(start_id):
+            rows = self.client.query(
+                collection_name=self.collection_name,
+                filter=f"id >= {start_id} and id < {start_id + LOAD_PAGE_SIZE}",
+                output_fields=["id", "text"],
+                limit=LOAD_PAGE_SIZE,
+                consistency_level="Strong"
+            )
+            rows.sort(key=lambda row: row['id'])
+            chunks.extend((row['id'], row['text']) for row in rows)
+            start_id += LOAD_PAGE_SIZE
+        return chunks
+
+    def refresh(self, force: bool = False):
+        """Index chunks other processes have added since the last refresh; only new rows are read."""
+        with self._lock:
+            if not force and time.time() - self._refreshed_at < RAG_REFRESH_SECONDS:
+                return 0
+            self._refreshed_at = time.time()
+            new_chunks = self._fetch_chunks(len(self.all_chunks))
+            if not new_chunks:
+                return 0
+            self._index_chunks(new_chunks)
+            return len(new_chunks)
+
+    def _index_chunks(self, chunks: List[Tuple[int, str]]):
+        """Append (id, text) chunks past the end of all_chunks; ids skipped over were deleted."""
+        texts, gaps = [], []
+        for chunk_id, text in chunks:
+            while len(self.all_chunks) + len(texts) < chunk_id:
+                gaps.append(len(self.all_chunks) + len(texts))
+                texts.append(None)
+            texts.append(text)
+        # Only the new chunks' terms are touched, however large the corpus already is
+        self.bm25.add([word_tokenize(text.lower()) if text is not None else [] for text in texts])
+        if gaps:
+            self.bm25.remove(gaps)
+        self.all_chunks.extend(texts)
+
+    def _forget(self, chunk_ids: List[int]):
+        local = [i for i in chunk_ids if i < len(self.all_chunks)]
+        if local:
+            self.bm25.remove(local)
+            for i in local:
+                self.all_chunks[i] = None
+
+    def remove_source(self, source_name: str) -> int:
+        """Delete every chunk added under source_name; returns how many there were."""
+        with self._lock:
+            rows = self.client.query(
+                collection_name=self.collection_name,
+                filter=f"source == {json.dumps(source_name)}",
+                output_fields=["id"]
+            )
+            chunk_ids = [row['id'] for row in rows]
+            if chunk_ids:
+                self.client.delete(collection_name=self.collection_name, ids=chunk_ids)
+                self._forget(chunk_ids)
+            return len(chunk_ids)
 
     def chunk_text(self, text: str, client_name:str, chunk_size: int = 50, overlap: int = 10) -> List[str]:
         """Split text into overlapping chunks."""
@@ -91,47 +188,78 @@ class RAGSystem:
             
         return chunks
 
-    def add_text(self, text: str, client_name: str, source_name: str = "custom_input"):
-        """Add a new text string to the knowledge base."""
+    def add_text(self, text: str, client_name: str, source_name: str = "custom_input", replace: bool = False):
+        """Add a new text string to the knowledge base.
+
+        With replace, chunks already stored under source_name are deleted
+        first, so adding the same source again (a retry, or a reprocessed
+        meeting) leaves one copy instead of two.
+        """
         try:
             # Process the content
             chunks = self.chunk_text(text,client_name)
+            # Encoding is the slow part and needs no lock
             embeddings = self.encoder.encode(chunks)
-            
-            # Prepare data for insertion
-            data = []
-            start_id = len(self.all_chunks)
-            
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                data.append({
-                    "id": start_id + i,
-                    "embedding": embedding,
-                    "text": chunk,
-                    "source": source_name
-                })
-                
-                # Add to BM25 components
-                self.all_chunks.append(chunk)
-                self.tokenized_chunks.append(word_tokenize(chunk.lower()))
-            
-            # Insert into Milvus
-            self.client.insert(
-                collection_name=self.collection_name,
-                data=data
-            )
-            
-            # Update BM25 index
-            self.bm25 = BM25Okapi(self.tokenized_chunks)
+
+            with self._lock, write_lock() as lock_file:
+                if replace:
+                    removed = self.remove_source(source_name)
+                    if removed:
+                        print(f"Replacing {removed} chunks from source: {source_name}")
+                # Pick up chunks other writers added first, so new ids start past theirs
+                self.refresh(force=True)
+
+                # Prepare data for insertion; ids are never reused, even after the newest chunks were deleted
+                data = []
+                lock_file.seek(0)
+                start_id = max(len(self.all_chunks), int(lock_file.read().strip() or 0))
+
+                for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+                    data.append({
+                        "id": start_id + i,
+                        "embedding": embedding,
+                        "text": chunk,
+                        "source": source_name
+                    })
+
+                # Insert into Milvus
+                self.client.insert(
+                    collection_name=self.collection_name,
+                    data=data
+                )
+                lock_file.truncate(0)
+                lock_file.write(str(start_id + len(data)))
+                lock_file.flush()
+
+                # Update BM25 components
+                self._index_chunks([(start_id + i, chunk) for i, chunk in enumerate(chunks)])
             
             print(f"Successfully added text from source: {source_name}")
             print(f"Added {len(chunks)} new chunks to the knowledge base")
             
         except Exception as e:
             print(f"Error processing text: {str(e)}")
+            raise
+
+    def _live_hits(self, hits: List[Tuple[int, float]]) -> List[Tuple[str, float]]:
+        """(text, score) of the BM25 hits still stored, dropping any another process deleted or replaced."""
+        if not hits:
+            return []
+        rows = self.client.query(
+            collection_name=self.collection_name,
+            filter=f"id in {[chunk_id for chunk_id, _ in hits]}",
+            output_fields=["id", "text"]
+        )
+        stored = {row['id']: row['text'] for row in rows}
+        with self._lock:
+            stale = [chunk_id for chunk_id, _ in hits if stored.get(chunk_id) != self.all_chunks[chunk_id]]
+            self._forget(stale)
+        return [(stored[chunk_id], score) for chunk_id, score in hits if chunk_id not in stale]
 
     def hybrid_search(self, query: str, top_k: int = 4) -> List[Dict[str, Any]]:
         """Perform hybrid search combining vector similarity and BM25."""
-        if not self.all_chunks:
+        self.refresh()
+        if not len(self.bm25):
             return []
             
         # Vector search
@@ -145,8 +273,11 @@ class RAGSystem:
         
         # BM25 search
         tokenized_query = word_tokenize(query.lower())
-        bm25_scores = self.bm25.get_scores(tokenized_query)
-        top_bm25_indices = np.argsort(bm25_scores)[-3:][::-1]
+        # Scoring reads postings that add_text extends in place, so it runs under the lock.
+        # A few spare hits cover chunks deleted by another process that this one still indexes
+        with self._lock:
+            top_bm25 = self.bm25.top_k(tokenized_query, 6)
+        top_bm25 = self._live_hits(top_bm25)[:3]
         
         # Combine results
         candidates = []
@@ -161,11 +292,11 @@ class RAGSystem:
             })
         
         # Add BM25 results
-        for idx in top_bm25_indices:
+        for text, score in top_bm25:
             candidates.append({
-                'text': self.all_chunks[idx],
+                'text': text,
                 'score_type': 'bm25',
-                'score': bm25_scores[idx]
+                'score': score
             })
         
         # Remove duplicates (keeping the higher-scored version)
@@ -211,4 +342,18 @@ class RAGSystem:
             }
         except Exception as e:
             print(f"Error getting stats: {str(e)}")
-            return {"total_chunks": 0, "unique_sources": 0}
\ No newline at end of file
+            return {"total_chunks": 0, "unique_sources": 0}
+
+
+_rag_system = None
+_rag_system_lock = threading.Lock()
+
+
+def get_rag_system() -> RAGSystem:
+    """The RAGSystem shared by every request in this process, created on first use."""
+    global _rag_system
+    if _rag_system is None:
+        with _rag_system_lock:
+            if _rag_system is None:
+                _rag_system = RAGSystem()
+    return _rag_system
@@ -3,6 +3,7 @@ import time
 import json
 import uuid
 import typing
+import asyncio
 from datetime import datetime, UTC
 from app import (
     app,
@@ -37,7 +38,7 @@ from models import (
     ChatHistoryRequest,
 )
 
-from rag import RAGSystem
+from rag import get_rag_system
 import bson.json_util as jutil
 from invoke_agent import agent_run
 import base64
@@ -45,6 +46,14 @@ from cryptography.fernet import Fernet
 
 cipher_suite = Fernet(os.getenv("FERNET_KEY"))
 
+
+# Build the shared RAG index when the worker starts, so the first question doesn't wait for it
+@app.on_event("startup")
+async def warm_rag_system():
+    started = time.time()
+    await asyncio.to_thread(get_rag_system)
+    logging.info(f"RAG system ready in {time.time() - started:.1f}s")
+
 # API for generating OpenAPI Specs, important to add API Prefix
 @app.get(f"/kapnotes/openapi.json", response_model=OpenAPI, include_in_schema=False)
 async def openapi(request: Request):
@@ -320,28 +329,39 @@ async def fetch_chat_history(
 
 @app.post(f"/kapnotes/chat/initialize", tags=["Completions"])
 async def chat_initialize(
-    request_body: ChatConversationInitialization, current_user: str = Depends(get_current_user)
+    request: Request, request_body: ChatConversationInitialization, current_user: str = Depends(get_current_user)
 ) -> typing.Dict:
     """
     DANGER: Never do this if you are unsure. Leads to production breakage.
     """
     start_time = time.time()
+    # Set by Notter so this ingest can be matched to the meeting's trace
+    trace_id = request.headers.get("X-Trace-Id")
     
     try:
-        rag = RAGSystem()
-        rag.add_text(request_body.text, request_body.client_id, source_name="meeting_notes_2024")
+        # Shared, already-warm index; the add runs off the event loop
+        rag = get_rag_system()
+        # Keyed by meeting, a retried or reprocessed ingest replaces its earlier chunks
+        await asyncio.to_thread(
+            rag.add_text, request_body.text, request_body.client_id,
+            source_name=request_body.source_id or "meeting_notes_2024",
+            replace=request_body.source_id is not None
+        )
+        eval_time = time.time() - start_time
+        logging.info(f"RAG initialize for {request_body.client_id} took {eval_time:.3f}s [trace_id={trace_id}]")
         
         return JSONResponse(
             {
                 "status": "success",
-                "eval_time": time.time() - start_time,
+                "eval_time": eval_time,
+                "trace_id": trace_id,
             }
         )
     except Exception as e:
         return JSONResponse(
             {
                 "status": "failed",
-                "reason": e,
+                "reason": str(e),
                 "eval_time": time.time() - start_time,
             }
         )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from rag import RAGSystem
+from rag import get_rag_system
 from typing import Optional, Type
 from pydantic import BaseModel, Field
 from langchain.tools import BaseTool
@@ -28,7 +28,7 @@ class FetchRAGAnswer(BaseTool):
     ) -> str:
 
         try:
-            rag = RAGSystem()
+            rag = get_rag_system()
             results = rag.hybrid_search(question)
             print(re_full_text(results))
             return re_full_text(results)
@@ -95,45 +95,186 @@ document.addEventListener('DOMContentLoaded', function() {
         };
     }
 
-    // Upload audio to cloud
+    const NOTTER_URL = 'https://happy-topical-jaybird.ngrok-free.app/notter';
+    const UPLOAD_PART_SIZE = 1024 * 1024; // 1MB parts
+    const UPLOAD_CONCURRENCY = 4;
+
+    async function fetchWithTimeout(url, options = {}, timeoutMs = 30000) {
+        const controller = new AbortController();
+        const timeoutId = setTimeout(() => controller.abort(), timeoutMs);
+        try {
+            const response = await fetch(url, { ...options, signal: controller.signal });
+            if (!response.ok) {
+                throw new Error(`Server returned ${response.status}: ${response.statusText}`);
+            }
+            return response;
+        } finally {
+            clearTimeout(timeoutId);
+        }
+    }
+
+    function backoff(attempt) {
+        return new Promise(resolve => setTimeout(resolve, Math.min(1000 * Math.pow(2, attempt), 5000)));
+    }
+
+    async function putWithRetry(url, body, retryCount) {
+        for (let attempt = 1; attempt <= retryCount; attempt++) {
+            try {
+                await fetchWithTimeout(url, {
+                    method: 'PUT',
+                    headers: { 'Content-Type': 'application/octet-stream' },
+                    body: body
+                });
+                return;
+            } catch (error) {
+                console.error(`PUT ${url} attempt ${attempt} failed:`, error);
+                if (attempt === retryCount) {
+                    throw error;
+                }
+                await backoff(attempt);
+            }
+        }
+    }
+
+    // Send one part, retrying it on its own so a dropped request only costs 1MB
+    async function uploadPart(uploadId, audioBlob, partNumber, retryCount) {
+        const start = (partNumber - 1) * UPLOAD_PART_SIZE;
+        const part = audioBlob.slice(start, start + UPLOAD_PART_SIZE);
+        await putWithRetry(`${NOTTER_URL}/uploads/${uploadId}/parts/${partNumber}`, part, retryCount);
+    }
+
+    // Stream recorder chunks to Notter while the meeting runs, so it transcribes as we go
+    async function openLiveStream(metadata) {
+        const paths = generateFilePath(metadata);
+        const response = await fetchWithTimeout(`${NOTTER_URL}/streams`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                contentType: 'audio/webm;codecs=opus',
+                metadata: {
+                    ...metadata,
+                    filePath: paths.fullPath,
+                    fileName: paths.fileName,
+                    folderPath: paths.folderPath
+                }
+            })
+        });
+        const streamId = (await response.json()).stream_id;
+        const chunks = [];
+        let sending = Promise.resolve();
+
+        function sendChunk(seq, retryCount = 3) {
+            return putWithRetry(`${NOTTER_URL}/streams/${streamId}/chunks/${seq}`, chunks[seq - 1], retryCount);
+        }
+
+        return {
+            push(data) {
+                chunks.push(data);
+                const seq = chunks.length;
+                // One chunk at a time, in order; a chunk that still fails is resent when the stream ends
+                sending = sending
+                    .then(() => sendChunk(seq))
+                    .catch(error => console.error(`Live chunk ${seq} failed:`, error));
+            },
+
+            async finish(metadata, retryCount = 3) {
+                await sending;
+                const paths = generateFilePath(metadata);
+                for (let attempt = 1; attempt <= retryCount; attempt++) {
+                    try {
+                        // Resend whatever the server has not acknowledged, then close the stream
+                        const session = await (await fetchWithTimeout(`${NOTTER_URL}/streams/${streamId}`)).json();
+                        const received = new Set(session.received);
+                        for (let seq = 1; seq <= chunks.length; seq++) {
+                            if (!received.has(seq)) {
+                                await sendChunk(seq);
+                            }
+                        }
+
+                        status.textContent = 'Finishing transcription...';
+                        const response = await fetchWithTimeout(`${NOTTER_URL}/streams/${streamId}/end`, {
+                            method: 'POST',
+                            headers: { 'Content-Type': 'application/json' },
+                            body: JSON.stringify({
+                                totalChunks: chunks.length,
+                                metadata: {
+                                    ...metadata,
+                                    filePath: paths.fullPath,
+                                    fileName: paths.fileName,
+                                    folderPath: paths.folderPath,
+                                    totalChunks: chunks.length
+                                }
+                            })
+                        }, 120000);
+
+                        const result = await response.json();
+                        status.textContent = result.duplicate
+                            ? `Recording already uploaded as ${result.matched_meeting}.`
+                            : 'Recording uploaded successfully.';
+                        return result;
+                    } catch (error) {
+                        console.error(`Ending live stream, attempt ${attempt} failed:`, error);
+                        if (attempt === retryCount) {
+                            throw error;
+                        }
+                        await backoff(attempt);
+                    }
+                }
+            }
+        };
+    }
+
+    // Upload audio to cloud as a multipart upload: parts go up in parallel, and a
+    // failed round resumes with only the parts the server has not received
     async function uploadToCloud(audioBlob, metadata, retryCount = 3) {
         const paths = generateFilePath(metadata);
-        const formData = new FormData();
-        
-        const maxChunkSize = 1024 * 1024; // 1MB chunks
-        const chunks = Math.ceil(audioBlob.size / maxChunkSize);
-        
-        formData.append('audio', audioBlob);
-        formData.append('clientName', metadata.clientName);
-        formData.append('metadata', JSON.stringify({
-            ...metadata,
-            filePath: paths.fullPath,
-            fileName: paths.fileName,
-            folderPath : paths.folderPath,
-            totalChunks: chunks
-        }));
+        const chunks = Math.max(1, Math.ceil(audioBlob.size / UPLOAD_PART_SIZE));
 
+        let uploadId = null;
         for (let attempt = 1; attempt <= retryCount; attempt++) {
             try {
-                status.textContent = `Uploading to server (attempt ${attempt}/${retryCount})...`;
-                
-                const controller = new AbortController();
-                const timeoutId = setTimeout(() => controller.abort(), 30000);
+                if (!uploadId) {
+                    const response = await fetchWithTimeout(`${NOTTER_URL}/uploads`, {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify({
+                            contentType: audioBlob.type,
+                            metadata: {
+                                ...metadata,
+                                filePath: paths.fullPath,
+                                fileName: paths.fileName,
+                                folderPath: paths.folderPath,
+                                totalChunks: chunks
+                            }
+                        })
+                    });
+                    uploadId = (await response.json()).upload_id;
+                }
 
-                const response = await fetch('https://happy-topical-jaybird.ngrok-free.app/notter/upload-audio', {
-                    method: 'POST',
-                    body: formData,
-                    signal: controller.signal
+                // Ask which parts are still missing, so a retry resumes instead of starting over
+                const session = await (await fetchWithTimeout(`${NOTTER_URL}/uploads/${uploadId}`)).json();
+                const missing = [...session.missing];
+                let sent = session.received.length;
+                status.textContent = `Uploading to server (${sent}/${chunks} parts)...`;
+
+                const workers = Array.from({ length: Math.min(UPLOAD_CONCURRENCY, missing.length) }, async () => {
+                    while (missing.length > 0) {
+                        await uploadPart(uploadId, audioBlob, missing.shift(), retryCount);
+                        sent++;
+                        status.textContent = `Uploading to server (${sent}/${chunks} parts)...`;
+                    }
                 });
+                await Promise.all(workers);
 
-                clearTimeout(timeoutId);
-
-                if (!response.ok) {
-                    throw new Error(`Server returned ${response.status}: ${response.statusText}`);
-                }
+                status.textContent = 'Finishing upload...';
+                const response = await fetchWithTimeout(`${NOTTER_URL}/uploads/${uploadId}/complete`, {
+                    method: 'POST'
+                }, 120000);
 
                 const result = await response.json();
-                status.textContent = 'Recording uploaded successfully.';
+                status.textContent = result.duplicate
+                    ? `Recording already uploaded as ${result.matched_meeting}.`
+                    : 'Recording uploaded successfully.';
                 return result;
 
             } catch (error) {
@@ -142,7 +283,7 @@ document.addEventListener('DOMContentLoaded', function() {
                     status.textContent = `Upload failed after ${retryCount} attempts: ${error.message}`;
                     throw error;
                 }
-                await new Promise(resolve => setTimeout(resolve, Math.min(1000 * Math.pow(2, attempt), 5000)));
+                await backoff(attempt);
             }
         }
     }
@@ -252,9 +393,24 @@ document.addEventListener('DOMContentLoaded', function() {
 
                     audioChunks = [];
 
+                    // Without a live stream the recording is uploaded in one go when it stops
+                    let liveStream = null;
+                    try {
+                        liveStream = await openLiveStream({
+                            clientName: clientNameInput.value.trim(),
+                            startDateTime: formatDateTime(recordingStartTime),
+                            recordingStartTime: recordingStartTime.toISOString()
+                        });
+                    } catch (error) {
+                        console.warn('Live streaming unavailable, uploading after the recording:', error);
+                    }
+
                     mediaRecorder.ondataavailable = function(event) {
                         if (event.data.size > 0) {
                             audioChunks.push(event.data);
+                            if (liveStream) {
+                                liveStream.push(event.data);
+                            }
                         }
                     };
 
@@ -282,7 +438,16 @@ document.addEventListener('DOMContentLoaded', function() {
                         });
 
                         try {
-                            await uploadToCloud(audioBlob, metadata);
+                            if (liveStream) {
+                                try {
+                                    await liveStream.finish(metadata);
+                                } catch (error) {
+                                    console.error('Live stream could not be finished, uploading the recording:', error);
+                                    await uploadToCloud(audioBlob, metadata);
+                                }
+                            } else {
+                                await uploadToCloud(audioBlob, metadata);
+                            }
                         } catch (error) {
                             console.error('Final upload attempt failed:', error);
                         }
@@ -0,0 +1,51 @@
+import numpy as np
+from scipy.ndimage import gaussian_filter1d
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+# Bump when the numbers below change meaning, so reprocess.py recomputes them
+ANALYTICS_VERSION = 1
+SENTIMENT_SIGMA = 2
+
+_analyzer = SentimentIntensityAnalyzer()
+
+
+def meeting_analytics(segments):
+    """Speaker talk time, words per minute and a smoothed sentiment curve for one transcript.
+
+    This is everything the dashboard plots, computed once at ingest so a
+    page load only reads analytics.json.
+    """
+    segments = [seg for seg in segments if seg.get("text")]
+    # Speakers in order of first appearance, as the dashboard lists them
+    names = list(dict.fromkeys(seg["speaker"] for seg in segments))
+    index = {name: i for i, name in enumerate(names)}
+    codes = np.fromiter((index[seg["speaker"]] for seg in segments), dtype=np.int64, count=len(segments))
+    durations = np.fromiter((seg["end"] - seg["start"] for seg in segments), dtype=np.float64, count=len(segments))
+    words = np.fromiter((len(seg["text"].split()) for seg in segments), dtype=np.float64, count=len(segments))
+
+    talktime = np.bincount(codes, weights=durations, minlength=len(names))
+    word_counts = np.bincount(codes, weights=words, minlength=len(names))
+    total_talktime = float(talktime.sum())
+    word_per_minute = np.divide(word_counts * 60, talktime, out=np.zeros_like(talktime), where=talktime > 0)
+    percentage = talktime / total_talktime * 100 if total_talktime else np.zeros_like(talktime)
+
+    # Sentences in the order they were spoken
+    sentences = [s for s in " ".join(seg["text"] for seg in segments).split(".") if s.strip()]
+    polarity = np.array([_analyzer.polarity_scores(s)["compound"] for s in sentences], dtype=np.float64)
+    smoothed = gaussian_filter1d(polarity, sigma=SENTIMENT_SIGMA) if len(polarity) else polarity
+
+    return {
+        "version": ANALYTICS_VERSION,
+        "total_talktime": round(total_talktime, 2),
+        "speakers": [
+            {
+                "name": name,
+                "talktime": round(float(talktime[i]), 2),
+                "words": int(word_counts[i]),
+                "word_per_minute": round(float(word_per_minute[i]), 2),
+                "talktime_percentage": round(float(percentage[i]), 2),
+            }
+            for i, name in enumerate(names)
+        ],
+        "sentiment": np.round(smoothed, 3).tolist(),
+    }
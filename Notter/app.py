@@ -1,22 +1,32 @@
-from pydub import AudioSegment
-from google.cloud import storage
-from datetime import datetime
-import io
+from datetime import datetime, timedelta
+from typing import Optional
 import os
-import requests
-import tempfile
-from KapNotes import call_all
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
-from pydantic import BaseModel
+import fcntl
+import asyncio
+from contextlib import asynccontextmanager
+import httpx
+from KapNotes import start_ingestion, finish_ingestion
+from asr_jobs import completions
+from http_client import http
+import audio_cache
+from jobs import JobStore, IngestionWorkers, LIVE_JOB_PREFIX
+from catalog import MeetingCatalog
+from blob_store import get_blob_store, LocalBlobStore
+from tracing import new_trace_id, trace, span
+from executors import io_pool, pool_metrics, shutdown_pools
+from upload_sessions import UploadSessions, UploadError, MAX_PART_SIZE, MAX_PARTS, MAX_LIVE_CHUNKS
+from live_ingest import LiveStream, LiveTranscriptionFailed
+from KapNotes import summarizer, cache_analysis, uses_map_reduce
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
 import json
-import concurrent.futures
 
 app = FastAPI()
 
-bucket_name = os.environ['GCP_BUCKET_NAME']
 # os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = 'gcp_details.json'
-storage_client = storage.Client()
-bucket = storage_client.bucket(bucket_name.lower())
+# Shared with KapNotes: one pooled client, or a local directory when STORAGE_BACKEND=local
+blob_store = get_blob_store()
 
 # Configuration
 API_CONFIG = {
@@ -28,33 +38,65 @@ API_CONFIG = {
     "conversation_id": os.getenv("CONVERSATION_ID", "conv1"),
 }
 
-def get_meetings_for_date_count(folderPath):
-    prefix = f"{folderPath}/"
-    blobs = list(bucket.list_blobs(prefix=prefix))
-    meetings = set()
-    for blob in blobs:
-        parts = blob.name.split("/")
-        if len(parts) > 2 and parts[2]:
-            meetings.add(parts[2])
-    return len(meetings)
-
-def upload_to_gcp(blob_name, file_data):
+# Durable ingestion jobs, worked off by a bounded background pool
+job_store = JobStore(os.getenv("INGEST_DB", "ingestion_jobs.db"))
+ingestion_workers = IngestionWorkers(
+    job_store, start_ingestion, finish_ingestion, completions,
+    max_workers=int(os.getenv("INGEST_WORKERS", 2))
+)
+
+# Multipart uploads from the extension; sessions left open this long are dropped on startup
+upload_sessions = UploadSessions(os.getenv("UPLOAD_DB", "upload_sessions.db"), blob_store)
+UPLOAD_SESSION_TTL = timedelta(hours=float(os.getenv("UPLOAD_SESSION_TTL_HOURS", 24)))
+
+# Live streams, upload locks and ingestion workers live in this process's memory, so Notter runs
+# as a single worker; a second process started against the same state directory refuses to start
+SINGLE_WORKER_LOCK = os.getenv("NOTTER_LOCK_FILE", "notter.lock")
+single_worker_lock = None
+
+@app.on_event("startup")
+def claim_single_worker():
+    global single_worker_lock
+    lock_file = open(SINGLE_WORKER_LOCK, "w")
     try:
-        bucket = storage_client.get_bucket(bucket_name)
-        blob = bucket.blob(blob_name)
-        
-        # Create a temporary file to store the audio data
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            temp_file.write(file_data)
-            temp_file_path = temp_file.name
-        
-        # Upload the temporary file to GCP
-        blob.upload_from_filename(temp_file_path)
-        
-        # Clean up the temporary file
-        os.unlink(temp_file_path)
-        
-        return True, blob.public_url
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        raise RuntimeError(f"Another Notter process holds {SINGLE_WORKER_LOCK}; run a single worker")
+    single_worker_lock = lock_file
+
+@app.on_event("startup")
+def resume_ingestion():
+    resumed = ingestion_workers.resume()
+    if resumed:
+        print(f"Resumed {resumed} unfinished ingestion jobs")
+    stale = upload_sessions.abort_stale(UPLOAD_SESSION_TTL)
+    if stale:
+        print(f"Dropped {stale} abandoned multipart uploads")
+
+@app.on_event("shutdown")
+def stop_ingestion():
+    ingestion_workers.shutdown()
+    http.close()
+    shutdown_pools()
+
+@app.get('/notter/local-bucket/{name:path}')
+def local_bucket_object(name: str, expires: int, signature: str):
+    # Serves LocalBlobStore.url() links, the local stand-in for GCS signed URLs
+    if not isinstance(blob_store, LocalBlobStore) or not blob_store.verify_url(name, expires, signature):
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+    info = blob_store.stat(name)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Object not found")
+    return FileResponse(blob_store.local_path(name), media_type=info.content_type)
+
+# Index of client/date/meeting folders so lookups don't list the bucket
+catalog = MeetingCatalog(os.getenv("CATALOG_DB", "meeting_catalog.db"), blob_store)
+
+def upload_to_gcp(blob_name, file_path, content_type=None):
+    try:
+        # Stream the file from disk; large files go up as a resumable upload
+        return True, blob_store.upload_file(blob_name, file_path, content_type)
     except Exception as e:
         return False, str(e)
     
@@ -62,13 +104,7 @@ import json
 @app.get('/notter/get-clients')
 def get_clients():
     try:
-        blobs = list(bucket.list_blobs(prefix=""))
-        client_names = set()
-        for blob in blobs:
-            client_name = blob.name.split("/")[0]
-            if client_name:
-                client_names.add(client_name)
-        return {"clients": sorted(list(client_names))}
+        return {"clients": catalog.children("")}
     except Exception as e:
         return {'error': str(e)}, 500
 
@@ -84,8 +120,8 @@ def add_client(request: ClientRequest):
             raise HTTPException(status_code=400, detail="Client name is required")
         
         # Create an empty file in the client's folder to ensure it exists
-        blob = bucket.blob(f"{client_name}/.clientinfo")
-        blob.upload_from_string('')
+        blob_store.write_text(f"{client_name}/.clientinfo", '')
+        catalog.record(client_name)
 
         return {"status": "success"}
 
@@ -97,7 +133,75 @@ class Metadata(BaseModel):
     fileName: str = "audio.wav"
     filePath: str = "kapture/audio/file_one.wav"
     folderPath: str = "kapture/19-01-2025"
-    totalChunks: int = 1
+    totalChunks: int = Field(1, ge=1, le=MAX_PARTS)
+
+# Uploads of the same recording by the same client go through the dedup check one at a time
+upload_locks = {}
+
+@asynccontextmanager
+async def upload_lock(key):
+    entry = upload_locks.setdefault(key, [asyncio.Lock(), 0])
+    entry[1] += 1
+    try:
+        async with entry[0]:
+            yield
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0:
+            del upload_locks[key]
+
+def duplicate_upload(job, audio_sha256):
+    # An unfinished job still reads the cached copy; a finished one no longer needs it
+    if job["status"] == "completed":
+        audio_cache.release(audio_sha256, job["client_name"])
+    print(f"Duplicate upload of {job['folder_path']} ({audio_sha256[:12]})")
+    return {
+        "message": "Audio already uploaded",
+        "duplicate": True,
+        "matched_meeting": job["folder_path"],
+        "filename": f"{job['folder_path']}/{job['file_name']}",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "trace_id": job["trace_id"]
+    }
+
+async def register_upload(meta, audio_sha256, trace_id, store_audio, start_job=None):
+    """Store a spooled recording under a new meeting folder and queue its ingestion.
+
+    store_audio(blob_name) puts the audio in the bucket and returns
+    (success, url or error), as upload_to_gcp does. start_job(job_id)
+    queues the new job; by default it runs the whole pipeline.
+    """
+    # A retried or repeated upload of the same recording points at the meeting it already made
+    async with upload_lock((meta.clientName, audio_sha256)):
+        existing = await io_pool.run(job_store.find_by_audio, meta.clientName, audio_sha256)
+        if existing is not None:
+            return duplicate_upload(existing, audio_sha256)
+
+        # Reserve the next meeting folder; the counter is atomic across concurrent uploads
+        meta.folderPath = await io_pool.run(catalog.allocate_meeting, meta.folderPath)
+        blob_name = f"{meta.folderPath}/{meta.fileName}"
+
+        with span("upload.store"):
+            success, result = await io_pool.run(store_audio, blob_name)
+
+        if not success:
+            audio_cache.release(audio_sha256, meta.clientName)
+            raise HTTPException(status_code=500, detail=f"Failed to upload audio: {result}")
+
+        # Record the ingestion job before answering so it survives a restart
+        job_id = await io_pool.run(job_store.create, meta.clientName, meta.folderPath,
+                                   meta.fileName, audio_sha256, trace_id)
+
+    (start_job or ingestion_workers.submit)(job_id)
+    return {
+        "message": "Audio uploaded successfully",
+        "duplicate": False,
+        "url": result,
+        "filename": blob_name,
+        "job_id": job_id,
+        "trace_id": trace_id
+    }
 
 @app.post("/notter/upload-audio")
 async def upload_audio(
@@ -108,44 +212,253 @@ async def upload_audio(
         metadata_dict = json.loads(metadata)
         meta = Metadata(**metadata_dict)
 
-        # Convert audio file to WAV
-        audio_data = await audio.read()
-        audio_segment = AudioSegment.from_file(io.BytesIO(audio_data))
-        wav_file = io.BytesIO()
-        audio_segment.export(wav_file, format="wav")
-        wav_file.seek(0)
-
-        # Generate folder path and blob name
-        no_of_meetings = get_meetings_for_date_count(meta.folderPath)
-        meta.folderPath = f"{meta.folderPath}/meeting_{no_of_meetings + 1}"
-        blob_name = f"{meta.folderPath}/audio.wav"
-
-        # Upload to GCP
-        success, result = upload_to_gcp(blob_name, wav_file.read())
-
-        # Execute additional processing asynchronously
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            executor.submit(call_all, meta.clientName, meta.folderPath, meta.fileName)
-
-        if success:
-            return {
-                "message": "Audio uploaded successfully",
-                "url": result,
-                "filename": blob_name
-            }
-        else:
-            raise HTTPException(status_code=500, detail=f"Failed to upload audio: {result}")
+        # Every span of this meeting's ingestion, across Notter, ASR and ConvEng, carries this id
+        with trace(new_trace_id()) as trace_id:
+            # Keep the original compressed audio; spool it to the local cache while hashing it
+            suffix = audio_cache.audio_suffix(audio.content_type, audio.filename)
+            # Blocking work runs on the io pool so other requests, like /notter/chat, keep being served
+            with span("upload.spool"):
+                audio_sha256, local_path = await io_pool.run(
+                    audio_cache.spool_to_cache, audio.file, suffix, meta.clientName
+                )
+            meta.fileName = f"audio{suffix}"
+
+            # Upload to GCP
+            return await register_upload(
+                meta, audio_sha256, trace_id,
+                lambda blob_name: upload_to_gcp(blob_name, local_path, audio.content_type)
+            )
 
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid metadata JSON format")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class UploadInit(BaseModel):
+    metadata: Metadata
+    contentType: str = "audio/webm"
+
+def upload_session_status(session):
+    return {
+        "upload_id": session["upload_id"],
+        "status": session["status"],
+        "total_parts": session["total_parts"],
+        "received": session["received"],
+        "missing": session["missing"],
+        "received_bytes": session["received_bytes"],
+        "trace_id": session["trace_id"]
+    }
+
+async def get_upload_session(upload_id):
+    session = await io_pool.run(upload_sessions.get, upload_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+@app.post("/notter/uploads")
+async def init_upload(request: UploadInit):
+    """Open a multipart upload of metadata.totalChunks parts."""
+    meta = request.metadata
+    suffix = audio_cache.audio_suffix(request.contentType, meta.fileName)
+    try:
+        upload_id = await io_pool.run(
+            upload_sessions.create, meta.clientName, meta.dict(), request.contentType,
+            suffix, meta.totalChunks, new_trace_id()
+        )
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return upload_session_status(await get_upload_session(upload_id))
+
+@app.get("/notter/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """Parts received so far; a client resuming an upload sends only the missing ones."""
+    return upload_session_status(await get_upload_session(upload_id))
+
+async def read_part(request):
+    """Raw request body, refused as soon as it is known to exceed MAX_PART_SIZE."""
+    length = request.headers.get("content-length")
+    if length is not None and (not length.isdigit() or int(length) > MAX_PART_SIZE):
+        raise HTTPException(status_code=413, detail=f"Parts are limited to {MAX_PART_SIZE} bytes")
+    # Without a usable length, stop reading once the limit is passed
+    data = bytearray()
+    async for chunk in request.stream():
+        data += chunk
+        if len(data) > MAX_PART_SIZE:
+            raise HTTPException(status_code=413, detail=f"Parts are limited to {MAX_PART_SIZE} bytes")
+    return bytes(data)
+
+@app.put("/notter/uploads/{upload_id}/parts/{part_number}")
+async def upload_part(upload_id: str, part_number: int, request: Request):
+    # Parts are small, so the body is read whole, up to MAX_PART_SIZE; storing it runs on the io pool
+    data = await read_part(request)
+    session = await get_upload_session(upload_id)
+    with trace(session["trace_id"]):
+        try:
+            with span("upload.part", part=part_number, size=len(data)):
+                size = await io_pool.run(upload_sessions.put_part, upload_id, part_number, data)
+        except UploadError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return {"upload_id": upload_id, "part_number": part_number, "size": size}
+
+def check_complete(session):
+    if session["status"] != "open":
+        raise HTTPException(status_code=409, detail=f"Upload is {session['status']}")
+    if session["missing"]:
+        raise HTTPException(status_code=409, detail={
+            "message": "Upload is missing parts", "missing": session["missing"]
+        })
+
+async def complete_session(session, start_job=None):
+    """Assemble a session's parts into the meeting's audio and register it for ingestion."""
+    meta = Metadata(**session["metadata"])
+    meta.fileName = f"audio{session['suffix']}"
+    with trace(session["trace_id"]) as trace_id:
+        with span("upload.assemble", parts=session["total_parts"]):
+            audio_sha256, _ = await io_pool.run(upload_sessions.assemble, session)
+
+        def compose_audio(blob_name):
+            try:
+                return True, upload_sessions.compose(session, blob_name)
+            except Exception as e:
+                return False, str(e)
+
+        result = await register_upload(meta, audio_sha256, trace_id, compose_audio, start_job)
+    await io_pool.run(upload_sessions.finish, session, result)
+    return result
+
+@app.post("/notter/uploads/{upload_id}/complete")
+async def complete_upload(upload_id: str):
+    """Assemble the parts into the meeting's audio and start ingestion; safe to retry."""
+    async with upload_lock(("upload", upload_id)):
+        session = await get_upload_session(upload_id)
+        if session["status"] == "completed":
+            return session["result"]
+        check_complete(session)
+        return await complete_session(session)
+
+# Meetings being streamed from the extension while they are recorded, by stream id; held in
+# this process only, which is why Notter runs a single worker (claim_single_worker)
+live_streams = {}
+
+@app.post("/notter/streams")
+async def open_stream(request: UploadInit):
+    """Start a live stream; chunks are numbered from 1 in the order MediaRecorder produced them."""
+    meta = request.metadata
+    suffix = audio_cache.audio_suffix(request.contentType, meta.fileName)
+    trace_id = new_trace_id()
+    stream_id = await io_pool.run(
+        lambda: upload_sessions.create(meta.clientName, meta.dict(), request.contentType,
+                                       suffix, 0, trace_id, live=True)
+    )
+    try:
+        live_streams[stream_id] = await io_pool.run(
+            LiveStream, stream_id, meta.clientName, summarizer, cache_analysis, uses_map_reduce, trace_id
+        )
+    except OSError as e:
+        # Without a decoder the chunks are still stored and transcribed once the stream ends
+        print(f"Live decoding unavailable for stream {stream_id}: {e}")
+    return {"stream_id": stream_id, "trace_id": trace_id}
+
+@app.put("/notter/streams/{stream_id}/chunks/{seq}")
+async def stream_chunk(stream_id: str, seq: int, request: Request):
+    data = await read_part(request)
+    session = await get_upload_session(stream_id)
+    with trace(session["trace_id"]):
+        try:
+            # Appended to storage first, so the recording is complete even if live decoding fails
+            size = await io_pool.run(upload_sessions.put_part, stream_id, seq, data)
+        except UploadError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    stream = live_streams.get(stream_id)
+    if stream is not None:
+        try:
+            await io_pool.run(stream.feed, seq, data)
+        except LiveTranscriptionFailed as e:
+            # The stored chunks are transcribed as a whole recording when the stream ends
+            print(f"Live stream {stream_id} stopped decoding: {e}")
+            live_streams.pop(stream_id, None)
+            stream.close()
+    return {"stream_id": stream_id, "seq": seq, "size": size}
+
+@app.get("/notter/streams/{stream_id}")
+async def get_stream(stream_id: str):
+    """Chunks received, plus transcription progress and rolling notes while the meeting is live."""
+    status = upload_session_status(await get_upload_session(stream_id))
+    stream = live_streams.get(stream_id)
+    if stream is not None:
+        status["live"] = stream.progress()
+    return status
+
+class StreamEnd(BaseModel):
+    totalChunks: int = Field(..., ge=1, le=MAX_LIVE_CHUNKS)
+    metadata: Optional[Metadata] = None
+
+@app.post("/notter/streams/{stream_id}/end")
+async def end_stream(stream_id: str, request: StreamEnd):
+    """Close a live stream and start ingestion; safe to retry, e.g. after resending missing chunks."""
+    async with upload_lock(("upload", stream_id)):
+        session = await get_upload_session(stream_id)
+        if session["status"] == "completed":
+            return session["result"]
+        if session["status"] == "live":
+            metadata = request.metadata.dict() if request.metadata else None
+            await io_pool.run(upload_sessions.seal, stream_id, request.totalChunks, metadata)
+            session = await get_upload_session(stream_id)
+        check_complete(session)
+
+        start_job = None
+        started = []
+        stream = live_streams.pop(stream_id, None)
+        if stream is not None:
+            try:
+                with span("live.drain"):
+                    transcribed = await io_pool.run(stream.end, session["total_parts"])
+            except LiveTranscriptionFailed as e:
+                print(f"Live stream {stream_id} could not be finished, transcribing the recording: {e}")
+            else:
+                def start_job(job_id):
+                    started.append(job_id)
+                    ingestion_workers.submit_transcribed(job_id, f"{LIVE_JOB_PREFIX}{stream_id}", transcribed)
+
+        try:
+            return await complete_session(session, start_job)
+        finally:
+            # A duplicate or a failed completion leaves no job to read the live transcript
+            if start_job is not None and not started:
+                stream.cancel(transcribed)
+
+@app.delete("/notter/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    # Waits for a completion in progress, which then leaves nothing to abort
+    async with upload_lock(("upload", upload_id)):
+        await get_upload_session(upload_id)
+        aborted = await io_pool.run(upload_sessions.abort, upload_id)
+    return {"upload_id": upload_id, "aborted": aborted}
+
+@app.get("/notter/metrics/pools")
+def get_pool_metrics():
+    return pool_metrics()
+
+@app.get("/notter/jobs/{job_id}")
+def get_ingestion_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/notter/asr-callback")
+async def asr_callback(job: dict):
+    # The ASR service posts the job status here when a transcription finishes
+    if "job_id" not in job:
+        raise HTTPException(status_code=400, detail="job_id is required")
+    completions.notify(job["job_id"])
+    return {"status": "received"}
+
 class ChatRequest(BaseModel):
     message: str
 
 @app.post('/notter/chat')
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest):
     try:
         user_message = request.message
         # conversation_id = str(uuid.uuid4())
@@ -159,7 +472,8 @@ def chat(request: ChatRequest):
         }
         
         # Make the API call
-        response = requests.post(
+        response = await http.arequest(
+            "POST",
             f"{API_CONFIG['base_url']}{API_CONFIG['endpoint']}", 
             json=payload,
             headers={
@@ -172,5 +486,5 @@ def chat(request: ChatRequest):
         # Raise an error for bad responses
         return response['message']
 
-    except requests.RequestException as e:
+    except httpx.HTTPError as e:
         return {'error': str(e)}, 500
\ No newline at end of file
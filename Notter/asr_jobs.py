@@ -0,0 +1,119 @@
+import os
+import time
+import asyncio
+from pathlib import Path
+from http_client import http
+from tracing import trace_headers, current_trace_id
+
+ASR_BASE_URL = os.getenv("ASR_BASE_URL", "https://obviously-full-reptile.ngrok-free.app/kapnotes/")
+# Public URL of Notter's /notter/asr-callback; without it completion is detected by polling only
+ASR_CALLBACK_URL = os.getenv("ASR_CALLBACK_URL")
+ASR_DEADLINE_SECONDS = float(os.getenv("ASR_DEADLINE_SECONDS", 3 * 3600))
+POLL_INITIAL_SECONDS = 2.0
+POLL_MAX_SECONDS = 60.0
+
+
+class TranscriptionFailed(RuntimeError):
+    pass
+
+
+def submit_transcription(audio, client_id=None, session_id=None):
+    """Upload audio to the ASR service and return its job id without waiting.
+
+    With client_id, ASR names speakers enrolled for that client. Jobs sent
+    with the same session_id, such as the parts of one meeting, share their
+    SPEAKER_xx labels for everyone else.
+    """
+    data = {"callback_url": ASR_CALLBACK_URL} if ASR_CALLBACK_URL else {}
+    if client_id:
+        data["client_id"] = client_id
+    if session_id:
+        data["session_id"] = session_id
+    if current_trace_id():
+        data["trace_id"] = current_trace_id()
+    with open(audio, "rb") as audio_file:
+        response = http.request("POST", f"{ASR_BASE_URL}upload/",
+                                files={"file": (Path(audio).name, audio_file)}, data=data or None,
+                                headers=trace_headers())
+    response.raise_for_status()
+    return response.json()["job_id"]
+
+
+def fetch_status(asr_job_id):
+    response = http.request("GET", f"{ASR_BASE_URL}status/{asr_job_id}")
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_transcript(asr_job_id):
+    response = http.request("GET", f"{ASR_BASE_URL}download/{asr_job_id}")
+    response.raise_for_status()
+    return response.json()
+
+
+class AsrCompletions:
+    """Waits for ASR jobs to finish, by webhook when one arrives and by backoff polling otherwise.
+
+    All waiting happens as coroutines on the shared HTTP client's event
+    loop, so no thread is held while a transcription is in flight.
+    """
+
+    def __init__(self):
+        # Only touched from the HTTP client's loop
+        self._events = {}
+
+    def _event(self, asr_job_id):
+        if asr_job_id not in self._events:
+            self._events[asr_job_id] = asyncio.Event()
+        return self._events[asr_job_id]
+
+    def _wake(self, asr_job_id):
+        # Only jobs someone is waiting on have an event; a callback for any other job, or one
+        # arriving before wait() starts, is covered by wait()'s first status poll
+        event = self._events.get(asr_job_id)
+        if event is not None:
+            event.set()
+
+    def notify(self, asr_job_id):
+        """Called by the webhook endpoint from any thread or loop."""
+        http.call_soon(lambda: self._wake(asr_job_id))
+
+    async def _status(self, asr_job_id):
+        response = await http.arequest("GET", f"{ASR_BASE_URL}status/{asr_job_id}")
+        response.raise_for_status()
+        return response.json()
+
+    async def wait(self, asr_job_id, deadline):
+        """Return once the job has completed; raise if it failed or the deadline passes."""
+        event = self._event(asr_job_id)
+        interval = POLL_INITIAL_SECONDS
+        try:
+            while True:
+                status = await self._status(asr_job_id)
+                if status["status"] == "completed":
+                    return status
+                if status["status"] == "failed":
+                    raise TranscriptionFailed(status.get("error") or "ASR job failed")
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise TimeoutError(f"ASR job {asr_job_id} did not finish before its deadline")
+                # A webhook wakes us early; otherwise back off until the next poll
+                try:
+                    await asyncio.wait_for(event.wait(), timeout=min(interval, remaining))
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+                interval = min(interval * 2, POLL_MAX_SECONDS)
+        finally:
+            self._events.pop(asr_job_id, None)
+
+    def watch(self, asr_job_id, deadline=None):
+        """Start waiting in the background; returns a concurrent.futures.Future."""
+        deadline = deadline or time.time() + ASR_DEADLINE_SECONDS
+        return http.spawn(self.wait(asr_job_id, deadline))
+
+    def wait_blocking(self, asr_job_id, deadline=None):
+        return self.watch(asr_job_id, deadline).result()
+
+
+completions = AsrCompletions()
@@ -0,0 +1,92 @@
+import os
+import hashlib
+import tempfile
+from pathlib import Path
+
+AUDIO_CACHE_DIR = Path(os.getenv("AUDIO_CACHE_DIR", "audio_cache"))
+AUDIO_CACHE_DIR.mkdir(exist_ok=True)
+
+COPY_BLOCK_SIZE = 1024 * 1024
+
+CONTENT_TYPE_SUFFIXES = {
+    "audio/webm": ".webm",
+    "audio/ogg": ".ogg",
+    "audio/wav": ".wav",
+    "audio/x-wav": ".wav",
+    "audio/wave": ".wav",
+    "audio/mpeg": ".mp3",
+    "audio/mp4": ".m4a",
+}
+
+
+def audio_suffix(content_type, filename=None):
+    """Pick a file suffix for an upload from its content type, then its filename."""
+    base_type = (content_type or "").split(";")[0].strip().lower()
+    if base_type in CONTENT_TYPE_SUFFIXES:
+        return CONTENT_TYPE_SUFFIXES[base_type]
+    suffix = Path(filename or "").suffix.lower()
+    return suffix or ".webm"
+
+
+def _read_blocks(fileobj):
+    while True:
+        block = fileobj.read(COPY_BLOCK_SIZE)
+        if not block:
+            return
+        yield block
+
+
+def _entry_name(sha256, client_name):
+    # Uploads are deduplicated per client, so two clients sending the same recording get
+    # separate entries and one client's job finishing never releases the other's audio
+    client_key = hashlib.sha256(client_name.encode("utf-8")).hexdigest()[:16]
+    return f"{sha256}-{client_key}"
+
+
+def _spool_blocks(blocks, suffix, client_name):
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=AUDIO_CACHE_DIR, suffix=".part", delete=False) as temp_file:
+        for block in blocks:
+            digest.update(block)
+            temp_file.write(block)
+    sha256 = digest.hexdigest()
+    path = AUDIO_CACHE_DIR / f"{_entry_name(sha256, client_name)}{suffix}"
+    os.replace(temp_file.name, path)
+    return sha256, path
+
+
+def spool_to_cache(fileobj, suffix, client_name):
+    """Stream a client's upload into the local cache while hashing it; returns (sha256, path)."""
+    return _spool_blocks(_read_blocks(fileobj), suffix, client_name)
+
+
+def assemble_to_cache(part_paths, suffix, client_name):
+    """Concatenate uploaded parts, in order, into the local cache while hashing; returns (sha256, path)."""
+    def blocks():
+        for part_path in part_paths:
+            with open(part_path, "rb") as part:
+                yield from _read_blocks(part)
+    return _spool_blocks(blocks(), suffix, client_name)
+
+
+def transcode_to_wav(source_path, wav_path):
+    """Decode any ffmpeg-readable audio and write it as WAV; CPU-bound, run it on the cpu pool."""
+    from pydub import AudioSegment
+    AudioSegment.from_file(source_path).export(wav_path, format="wav")
+    return str(wav_path)
+
+
+def cached_audio(sha256, client_name):
+    """Local copy of a client's upload by content hash, if it is still cached."""
+    if not sha256:
+        return None
+    for path in AUDIO_CACHE_DIR.glob(f"{_entry_name(sha256, client_name)}.*"):
+        return path
+    return None
+
+
+def release(sha256, client_name):
+    """Drop a client's cache entry once its ingestion no longer needs it."""
+    path = cached_audio(sha256, client_name)
+    if path is not None:
+        path.unlink(missing_ok=True)
@@ -0,0 +1,88 @@
+"""Single-call against map-reduce summarization latency, offline.
+
+Starts stub_llm.py under uvicorn, builds synthetic meetings of increasing
+length and times one whole-transcript call against MapReduceSummarizer at
+a few concurrency levels. The stub's peak in-flight count shows the map
+pool bound being respected. Run with ``python bench_summarize.py``.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import subprocess
+import httpx
+
+PORT = int(os.getenv("STUB_LLM_PORT", 8089))
+STUB_URL = f"http://127.0.0.1:{PORT}"
+os.environ.setdefault("OPENAI_API_KEY", "stub")
+os.environ["OPENAI_BASE_URL"] = f"{STUB_URL}/v1"
+
+from summarize import MapReduceSummarizer
+from transcript import transcript_lines, count_tokens
+
+MEETING_MINUTES = [15, 60, 180]
+CONCURRENCY = [1, 4, 8]
+WORDS = ("budget roadmap launch customer deadline review hiring metrics onboarding "
+         "migration latency pricing contract renewal feedback dashboard").split()
+
+
+def synthetic_transcript(minutes):
+    """About 150 spoken words a minute, in turns of 10-40 words."""
+    rng = random.Random(minutes)
+    segments, words, t = [], 0, 0.0
+    while words < minutes * 150:
+        n = rng.randint(10, 40)
+        text = " ".join(rng.choice(WORDS) for _ in range(n))
+        segments.append({"speaker": f"SPEAKER_{rng.randint(0, 3)}", "start": t, "end": t + n / 2.5, "text": text})
+        words += n
+        t += n / 2.5
+    return segments
+
+
+def wait_for_stub():
+    for _ in range(50):
+        try:
+            httpx.get(f"{STUB_URL}/stats").raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("stub LLM did not start")
+
+
+async def run(summarizer, lines):
+    httpx.post(f"{STUB_URL}/stats/reset")
+    started = time.time()
+    _, stats = await summarizer.summarize(lines)
+    peak = httpx.get(f"{STUB_URL}/stats").json()["peak_in_flight"]
+    return time.time() - started, stats["windows"], peak
+
+
+async def single(summarizer, lines):
+    started = time.time()
+    await summarizer.complete("Summarize this meeting:\n" + "\n".join(lines), summarizer.max_tokens)
+    return time.time() - started
+
+
+async def main():
+    print(f"{'minutes':>8} {'tokens':>8} {'single s':>9} {'conc':>5} {'windows':>8} {'map-reduce s':>13} {'peak':>5}")
+    for minutes in MEETING_MINUTES:
+        lines = transcript_lines(synthetic_transcript(minutes))
+        tokens = count_tokens("\n".join(lines))
+        baseline = await single(MapReduceSummarizer("gpt-4o"), lines)
+        for concurrency in CONCURRENCY:
+            summarizer = MapReduceSummarizer("gpt-4o", concurrency=concurrency)
+            elapsed, windows, peak = await run(summarizer, lines)
+            print(f"{minutes:>8} {tokens:>8} {baseline:>9.2f} {concurrency:>5} {windows:>8} {elapsed:>13.2f} {peak:>5}")
+
+
+if __name__ == "__main__":
+    stub = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "stub_llm:app", "--port", str(PORT), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    try:
+        wait_for_stub()
+        asyncio.run(main())
+    finally:
+        stub.terminate()
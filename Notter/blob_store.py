@@ -0,0 +1,363 @@
+import os
+import abc
+import hmac
+import time
+import hashlib
+import shutil
+import uuid
+import tempfile
+import mimetypes
+import functools
+import concurrent.futures
+from pathlib import Path
+from collections import namedtuple
+from datetime import timedelta
+from urllib.parse import quote
+
+# checksum changes whenever the content does: the crc32c in GCS, size and mtime in the local store
+BlobInfo = namedtuple("BlobInfo", ["name", "size", "content_type", "checksum"], defaults=(None,))
+
+# Recordings from the extension are audio-only; mimetypes would call them video/webm
+mimetypes.add_type("audio/webm", ".webm")
+
+# Objects above the chunk size go through a resumable upload
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+# GCS composes at most this many source objects in one request
+COMPOSE_MAX_SOURCES = 32
+# Key for LocalBlobStore's signed URLs, kept in the store root so every process using it agrees
+LOCAL_URL_SECRET = ".url-secret"
+
+
+class BlobStore(abc.ABC):
+    """Object storage used by Notter and the dashboard: GCS in production, a local directory offline.
+
+    Object names are "/"-separated paths such as client/date/meeting_n/summary.txt.
+    Folders whose name starts with "." hold scratch objects, such as upload
+    parts, and are left out of list_prefixes.
+    """
+
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+
+    @abc.abstractmethod
+    def upload_file(self, name, file_path, content_type=None):
+        """Stream a local file into the store; returns a URL for the object."""
+
+    @abc.abstractmethod
+    def write_text(self, name, text, content_type="text/plain"):
+        """Create or replace an object with UTF-8 text."""
+
+    @abc.abstractmethod
+    def read_text(self, name):
+        """Whole object decoded as UTF-8."""
+
+    @abc.abstractmethod
+    def download_file(self, name, file_path):
+        """Copy an object to a local file."""
+
+    @abc.abstractmethod
+    def open(self, name, mode="rb"):
+        """File object for streaming reads or writes."""
+
+    @abc.abstractmethod
+    def stat(self, name):
+        """BlobInfo for the object, or None if it does not exist."""
+
+    def exists(self, name):
+        return self.stat(name) is not None
+
+    @abc.abstractmethod
+    def delete(self, name):
+        """Remove an object; a missing one is not an error."""
+
+    @abc.abstractmethod
+    def compose(self, names, destination, content_type=None):
+        """Concatenate objects, in order, into destination without passing them through this host."""
+
+    @abc.abstractmethod
+    def list(self, prefix):
+        """BlobInfo for every object whose name starts with prefix."""
+
+    @abc.abstractmethod
+    def list_prefixes(self, prefix, delimiter="/"):
+        """Names of the immediate sub-folders under prefix, without listing the objects below them."""
+
+    @abc.abstractmethod
+    def url(self, name, expiration=timedelta(hours=1)):
+        """URL the browser can fetch the object from."""
+
+    @abc.abstractmethod
+    def create_bucket(self, location=None, storage_class="STANDARD"):
+        """Create the bucket or root directory the store writes to."""
+
+    def _map(self, fn, items):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda args: fn(*args), items))
+
+    def upload_many(self, items):
+        """Upload (name, file_path, content_type) triples concurrently; returns their URLs."""
+        return self._map(self.upload_file, items)
+
+    def write_many(self, items):
+        """Write (name, text) pairs, or (name, text, content_type) triples, concurrently."""
+        return self._map(self.write_text, items)
+
+    def download_many(self, items):
+        """Download (name, file_path) pairs concurrently."""
+        return self._map(self.download_file, items)
+
+    def delete_many(self, names):
+        return self._map(self.delete, [(name,) for name in names])
+
+
+class GCSBlobStore(BlobStore):
+    """One bucket through a single storage.Client whose HTTP session pool fits max_workers."""
+
+    def __init__(self, bucket_name, credentials=None, max_workers=8):
+        super().__init__(max_workers)
+        import requests
+        import google.auth
+        from google.auth.credentials import with_scopes_if_required
+        from google.auth.transport.requests import AuthorizedSession
+        from google.cloud import storage
+
+        project = None
+        if credentials is None:
+            credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+        credentials = with_scopes_if_required(credentials, storage.Client.SCOPE)
+        # The default pool keeps 10 connections; concurrent transfers would otherwise reconnect.
+        # Client takes the session through its documented _http argument
+        session = AuthorizedSession(credentials)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        session.mount("https://", adapter)
+        self.client = storage.Client(
+            project=project or getattr(credentials, "project_id", None),
+            credentials=credentials,
+            _http=session,
+        )
+        self.bucket = self.client.bucket(bucket_name)
+
+    def upload_file(self, name, file_path, content_type=None):
+        blob = self.bucket.blob(name, chunk_size=UPLOAD_CHUNK_SIZE)
+        blob.upload_from_filename(str(file_path), content_type=content_type)
+        return blob.public_url
+
+    def write_text(self, name, text, content_type="text/plain"):
+        self.bucket.blob(name).upload_from_string(text, content_type=content_type)
+
+    def read_text(self, name):
+        return self.bucket.blob(name).download_as_text()
+
+    def download_file(self, name, file_path):
+        self.bucket.blob(name).download_to_filename(str(file_path))
+
+    def open(self, name, mode="rb"):
+        return self.bucket.blob(name, chunk_size=UPLOAD_CHUNK_SIZE).open(mode)
+
+    def stat(self, name):
+        blob = self.bucket.get_blob(name)
+        if blob is None:
+            return None
+        return BlobInfo(blob.name, blob.size, blob.content_type, blob.crc32c)
+
+    def delete(self, name):
+        from google.api_core.exceptions import NotFound
+        try:
+            self.bucket.delete_blob(name)
+        except NotFound:
+            pass
+
+    def _compose(self, names, destination, content_type=None):
+        blob = self.bucket.blob(destination)
+        blob.content_type = content_type
+        blob.compose([self.bucket.blob(name) for name in names])
+        return blob
+
+    def compose(self, names, destination, content_type=None):
+        names = list(names)
+        scratch = f".compose/{uuid.uuid4().hex}"
+        intermediates = []
+        try:
+            # Fold larger sets into intermediate objects, one round per 32x
+            level = 0
+            while len(names) > COMPOSE_MAX_SOURCES:
+                groups = [names[i:i + COMPOSE_MAX_SOURCES] for i in range(0, len(names), COMPOSE_MAX_SOURCES)]
+                merged = [f"{scratch}/{level}-{i}" for i in range(len(groups))]
+                self._map(self._compose, list(zip(groups, merged)))
+                intermediates += merged
+                names = merged
+                level += 1
+            return self._compose(names, destination, content_type).public_url
+        finally:
+            self.delete_many(intermediates)
+
+    def list(self, prefix):
+        for blob in self.bucket.list_blobs(prefix=prefix):
+            yield BlobInfo(blob.name, blob.size, blob.content_type, blob.crc32c)
+
+    def list_prefixes(self, prefix, delimiter="/"):
+        iterator = self.bucket.list_blobs(prefix=prefix, delimiter=delimiter)
+        prefixes = set()
+        for page in iterator.pages:
+            prefixes.update(page.prefixes)
+        names = (p[len(prefix):].rstrip(delimiter) for p in prefixes)
+        return sorted(name for name in names if name and not name.startswith("."))
+
+    def url(self, name, expiration=timedelta(hours=1)):
+        return self.bucket.blob(name).generate_signed_url(expiration=expiration, method="GET")
+
+    def create_bucket(self, location, storage_class="STANDARD"):
+        self.bucket.storage_class = storage_class
+        self.bucket = self.client.create_bucket(self.bucket, location=location)
+        return self.bucket
+
+
+class LocalBlobStore(BlobStore):
+    """Objects as files under a root directory, for running the pipeline without the cloud.
+
+    url() returns a signed, expiring link under base_url, which Notter serves
+    from /notter/local-bucket, standing in for GCS signed URLs.
+    """
+
+    def __init__(self, root, max_workers=8, base_url=None):
+        super().__init__(max_workers)
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.base_url = (base_url or "http://127.0.0.1:8000/notter/local-bucket").rstrip("/")
+
+    def _path(self, name):
+        path = (self.root / name).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f"Object name escapes the store root: {name}")
+        return path
+
+    def local_path(self, name):
+        return self._path(name)
+
+    @functools.cached_property
+    def _url_secret(self):
+        path = self.root / LOCAL_URL_SECRET
+        if not path.exists():
+            fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+            with os.fdopen(fd, "wb") as f:
+                f.write(os.urandom(32))
+            try:
+                # Link rather than rename, so a process that lost the race keeps the first key
+                os.link(tmp_path, path)
+            except FileExistsError:
+                pass
+            finally:
+                os.unlink(tmp_path)
+        return path.read_bytes()
+
+    def _signature(self, name, expires):
+        return hmac.new(self._url_secret, f"{name}\n{expires}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def verify_url(self, name, expires, signature):
+        """Whether a url() for name is authentic and unexpired."""
+        if name == LOCAL_URL_SECRET or expires < time.time():
+            return False
+        return hmac.compare_digest(self._signature(name, expires), signature)
+
+    def _write(self, name, write):
+        # Write next to the target and rename, so readers never see a partial object
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return path
+
+    def upload_file(self, name, file_path, content_type=None):
+        def copy(f):
+            with open(file_path, "rb") as src:
+                shutil.copyfileobj(src, f, UPLOAD_CHUNK_SIZE)
+        return self._write(name, copy).as_uri()
+
+    def write_text(self, name, text, content_type="text/plain"):
+        self._write(name, lambda f: f.write(text.encode("utf-8")))
+
+    def read_text(self, name):
+        return self._path(name).read_text(encoding="utf-8")
+
+    def download_file(self, name, file_path):
+        shutil.copyfile(self._path(name), file_path)
+
+    def open(self, name, mode="rb"):
+        path = self._path(name)
+        if "w" in mode:
+            path.parent.mkdir(parents=True, exist_ok=True)
+        return open(path, mode)
+
+    def delete(self, name):
+        path = self._path(name)
+        path.unlink(missing_ok=True)
+        # Drop folders the delete emptied, as they would not exist in a bucket
+        parent = path.parent
+        while parent != self.root:
+            try:
+                parent.rmdir()
+            except OSError:
+                # Not empty, or already removed by a concurrent delete
+                break
+            parent = parent.parent
+
+    def compose(self, names, destination, content_type=None):
+        def concatenate(f):
+            for name in names:
+                with open(self._path(name), "rb") as src:
+                    shutil.copyfileobj(src, f, UPLOAD_CHUNK_SIZE)
+        return self._write(destination, concatenate).as_uri()
+
+    def _info(self, path):
+        name = path.relative_to(self.root).as_posix()
+        stat = path.stat()
+        return BlobInfo(name, stat.st_size, mimetypes.guess_type(path.name)[0],
+                        f"{stat.st_size:x}-{stat.st_mtime_ns:x}")
+
+    def stat(self, name):
+        path = self._path(name)
+        return self._info(path) if path.is_file() else None
+
+    def list(self, prefix):
+        # Walk only the deepest directory the prefix pins down
+        base = self.root / prefix.rpartition("/")[0]
+        if not base.is_dir():
+            return
+        for dirpath, _, filenames in os.walk(base):
+            for filename in sorted(filenames):
+                path = Path(dirpath) / filename
+                info = self._info(path)
+                if info.name.startswith(prefix) and not filename.startswith(".upload-") \
+                        and info.name != LOCAL_URL_SECRET:
+                    yield info
+
+    def list_prefixes(self, prefix, delimiter="/"):
+        base = self.root / prefix
+        if not prefix.endswith(delimiter) and prefix:
+            return []
+        if not base.is_dir():
+            return []
+        return sorted(entry.name for entry in os.scandir(base) if entry.is_dir() and not entry.name.startswith("."))
+
+    def url(self, name, expiration=timedelta(hours=1)):
+        expires = int(time.time() + expiration.total_seconds())
+        return f"{self.base_url}/{quote(name)}?expires={expires}&signature={self._signature(name, expires)}"
+
+    def create_bucket(self, location=None, storage_class=None):
+        self.root.mkdir(parents=True, exist_ok=True)
+
+
+@functools.lru_cache(maxsize=None)
+def get_blob_store(credentials=None):
+    """Process-wide store chosen by STORAGE_BACKEND ("gcs" or "local")."""
+    max_workers = int(os.getenv("STORAGE_MAX_WORKERS", 8))
+    if os.getenv("STORAGE_BACKEND", "gcs") == "local":
+        return LocalBlobStore(os.getenv("LOCAL_STORAGE_ROOT", "local_bucket"), max_workers,
+                              os.getenv("LOCAL_STORAGE_URL"))
+    return GCSBlobStore(os.getenv("GCP_BUCKET_NAME", "kapnotes").lower(), credentials, max_workers)
@@ -0,0 +1,105 @@
+import re
+import sqlite3
+import threading
+
+MEETING_PATTERN = re.compile(r"^meeting_(\d+)$")
+
+
+class MeetingCatalog:
+    """Local index of the client/date/meeting_n folder tree in the bucket.
+
+    Folders are recorded as they are written. A level that has never been
+    indexed is read once from the bucket with a delimiter listing, then
+    served from SQLite. Meeting numbers come from a per-date counter bumped
+    inside an IMMEDIATE transaction, so concurrent uploads, even from
+    separate worker processes, never get the same number.
+    """
+
+    def __init__(self, db_path, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS folders (parent TEXT NOT NULL, name TEXT NOT NULL, PRIMARY KEY (parent, name))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters (folder_path TEXT PRIMARY KEY, last INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS indexed (prefix TEXT PRIMARY KEY)")
+
+    def _insert_path(self, path):
+        parts = [part for part in path.strip("/").split("/") if part]
+        for i, name in enumerate(parts):
+            self._conn.execute(
+                "INSERT OR IGNORE INTO folders (parent, name) VALUES (?, ?)",
+                ("/".join(parts[:i]), name)
+            )
+
+    def _ensure_indexed(self, parent):
+        if self._conn.execute("SELECT 1 FROM indexed WHERE prefix = ?", (parent,)).fetchone():
+            return
+        # Fallback: read this level from the bucket once
+        names = self.store.list_prefixes(f"{parent}/" if parent else "")
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO folders (parent, name) VALUES (?, ?)",
+                [(parent, name) for name in names]
+            )
+            self._conn.execute("INSERT OR IGNORE INTO indexed (prefix) VALUES (?)", (parent,))
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    def children(self, parent=""):
+        """Names directly under parent: clients for "", dates for a client, meetings for client/date."""
+        parent = parent.strip("/")
+        with self._lock:
+            self._ensure_indexed(parent)
+            rows = self._conn.execute(
+                "SELECT name FROM folders WHERE parent = ? ORDER BY name", (parent,)
+            ).fetchall()
+        return [name for (name,) in rows]
+
+    def record(self, path):
+        """Record a folder, and its parents, written to the bucket."""
+        with self._lock:
+            self._insert_path(path)
+
+    def allocate_meeting(self, folder_path):
+        """Atomically reserve the next client/date/meeting_n folder."""
+        folder_path = folder_path.strip("/")
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT last FROM counters WHERE folder_path = ?", (folder_path,)
+            ).fetchone()
+            if row is None:
+                # Seed the counter from whatever meetings the bucket already holds
+                self._ensure_indexed(folder_path)
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT last FROM counters WHERE folder_path = ?", (folder_path,)
+                ).fetchone()
+                if row is None:
+                    existing = self._conn.execute(
+                        "SELECT name FROM folders WHERE parent = ?", (folder_path,)
+                    ).fetchall()
+                    numbers = [int(m.group(1)) for (name,) in existing if (m := MEETING_PATTERN.match(name))]
+                    last = max(numbers, default=0)
+                else:
+                    last = row[0]
+                number = last + 1
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO counters (folder_path, last) VALUES (?, ?)",
+                    (folder_path, number)
+                )
+                meeting_path = f"{folder_path}/meeting_{number}"
+                self._insert_path(meeting_path)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return meeting_path
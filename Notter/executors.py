@@ -0,0 +1,130 @@
+import os
+import time
+import asyncio
+import threading
+import contextvars
+import multiprocessing
+import concurrent.futures
+
+
+def _timed(fn, *args):
+    # Runs in the worker, so service time excludes the queue wait
+    started = time.time()
+    result = fn(*args)
+    return result, started, time.time()
+
+
+class PoolMetrics:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_time = 0.0
+        self.busy_time = 0.0
+        self.max_wait = 0.0
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    def submit(self):
+        with self._lock:
+            self.submitted += 1
+
+    def record(self, submitted, started, finished):
+        wait = max(0.0, started - submitted)
+        with self._lock:
+            self.completed += 1
+            self.wait_time += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.busy_time += max(0.0, finished - started)
+
+    def fail(self):
+        with self._lock:
+            self.failed += 1
+
+    def snapshot(self):
+        with self._lock:
+            in_flight = self.submitted - self.completed - self.failed
+            elapsed = max(time.time() - self.started_at, 1e-6)
+            done = max(self.completed, 1)
+            return {
+                "pool": self.name,
+                "workers": self.workers,
+                "in_flight": in_flight,
+                "queued": max(0, in_flight - self.workers),
+                "completed": self.completed,
+                "failed": self.failed,
+                "avg_wait_s": round(self.wait_time / done, 4),
+                "max_wait_s": round(self.max_wait, 4),
+                "avg_service_s": round(self.busy_time / done, 4),
+                "utilization": round(self.busy_time / (elapsed * self.workers), 3),
+            }
+
+
+class MeteredPool:
+    """A named thread or process pool that records queue wait and service time per task.
+
+    ``run`` awaits a task from a coroutine without blocking the event loop;
+    ``call`` runs one and waits for it from a plain thread.
+    """
+
+    def __init__(self, name, workers, processes=False):
+        self.name = name
+        self.processes = processes
+        self.metrics = PoolMetrics(name, workers)
+        if processes:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        else:
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+
+    def _submit(self, fn, *args):
+        self.metrics.submit()
+        submitted = time.time()
+        if self.processes:
+            future = self.executor.submit(_timed, fn, *args)
+        else:
+            # Threads keep the caller's context, e.g. the current trace
+            future = self.executor.submit(contextvars.copy_context().run, _timed, fn, *args)
+
+        result_future = concurrent.futures.Future()
+
+        def done(f):
+            error = f.exception()
+            if error is not None:
+                self.metrics.fail()
+                result_future.set_exception(error)
+                return
+            result, started, finished = f.result()
+            self.metrics.record(submitted, started, finished)
+            result_future.set_result(result)
+
+        future.add_done_callback(done)
+        return result_future
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def call(self, fn, *args):
+        return self._submit(fn, *args).result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Blocking I/O: spooling uploads, storage transfers, SQLite
+io_pool = MeteredPool("io", int(os.getenv("NOTTER_IO_THREADS", 16)))
+# CPU-bound work: audio transcoding, analytics
+cpu_pool = MeteredPool("cpu", int(os.getenv("NOTTER_CPU_PROCESSES", max(1, (os.cpu_count() or 2) // 2))),
+                       processes=True)
+
+
+def pool_metrics():
+    return {"pools": [io_pool.metrics.snapshot(), cpu_pool.metrics.snapshot()]}
+
+
+def shutdown_pools():
+    io_pool.shutdown()
+    cpu_pool.shutdown()
@@ -0,0 +1,100 @@
+import os
+import random
+import asyncio
+import threading
+import httpx
+
+# Responses worth retrying; anything else is returned to the caller as-is
+RETRY_STATUSES = {429, 502, 503, 504}
+# Methods safe to send twice. Others, such as the ASR upload and RAG ingest POSTs, are only
+# retried when the request cannot have reached the server
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+UNSENT_STATUSES = {429}
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class HttpClient:
+    """One pooled, keep-alive httpx.AsyncClient shared by every outbound call in Notter.
+
+    The client lives on its own event loop thread, so worker threads call
+    request() and async handlers await arequest() against the same pool.
+    Idempotent requests are retried on transport errors and RETRY_STATUSES;
+    others only when they never reached the server (connect errors, 429).
+    Retries use full-jitter exponential backoff.
+    """
+
+    def __init__(self, timeout=30.0, connect_timeout=5.0, max_connections=50,
+                 max_keepalive=20, retries=3, backoff_base=0.5, backoff_max=8.0):
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=60.0
+        )
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="http-client", daemon=True)
+        self._thread.start()
+        self._client = self._submit(self._create_client()).result()
+
+    async def _create_client(self):
+        return httpx.AsyncClient(timeout=self._timeout, limits=self._limits)
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    @staticmethod
+    def _rewind(kwargs):
+        # File bodies are consumed by each attempt
+        for value in (kwargs.get("files") or {}).values():
+            fileobj = value[1] if isinstance(value, tuple) else value
+            if hasattr(fileobj, "seek"):
+                fileobj.seek(0)
+
+    async def _request(self, method, url, retries=None, **kwargs):
+        retries = self.retries if retries is None else retries
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        retry_errors = httpx.TransportError if idempotent else UNSENT_ERRORS
+        retry_statuses = RETRY_STATUSES if idempotent else UNSENT_STATUSES
+        for attempt in range(retries + 1):
+            self._rewind(kwargs)
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except retry_errors:
+                if attempt == retries:
+                    raise
+            else:
+                if response.status_code not in retry_statuses or attempt == retries:
+                    return response
+            await asyncio.sleep(self._backoff(attempt))
+
+    def spawn(self, coro):
+        """Run a coroutine on the client's loop; returns a concurrent.futures.Future."""
+        return self._submit(coro)
+
+    def call_soon(self, callback):
+        self._loop.call_soon_threadsafe(callback)
+
+    def request(self, method, url, **kwargs):
+        """Blocking call for worker threads."""
+        return self._submit(self._request(method, url, **kwargs)).result()
+
+    async def arequest(self, method, url, **kwargs):
+        """Awaitable call for coroutines on any event loop, including the client's own."""
+        return await asyncio.wrap_future(self._submit(self._request(method, url, **kwargs)))
+
+    def close(self):
+        self._submit(self._client.aclose()).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+http = HttpClient(
+    timeout=float(os.getenv("HTTP_TIMEOUT", 30)),
+    max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", 50)),
+    retries=int(os.getenv("HTTP_RETRIES", 3))
+)
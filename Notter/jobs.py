@@ -0,0 +1,248 @@
+import json
+import sqlite3
+import threading
+import uuid
+import concurrent.futures
+from datetime import datetime
+from tracing import trace, record_span
+
+# Stages of KapNotes.call_all, in order
+STAGES = ["download", "transcribe", "analyze", "store", "rag", "analytics"]
+# asr_job_id prefix for jobs transcribed while the meeting was streamed live
+LIVE_JOB_PREFIX = "live:"
+
+
+class JobStore:
+    """Durable table of ingestion jobs backed by a local SQLite file."""
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS ingestion_jobs (
+                job_id TEXT PRIMARY KEY,
+                client_name TEXT NOT NULL,
+                folder_path TEXT NOT NULL,
+                file_name TEXT NOT NULL,
+                audio_sha256 TEXT,
+                asr_job_id TEXT,
+                status TEXT NOT NULL,
+                stages TEXT NOT NULL,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                trace_id TEXT
+            )"""
+        )
+        columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(ingestion_jobs)")]
+        if "trace_id" not in columns:
+            self._conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN trace_id TEXT")
+        # Per-client index of uploaded audio by content hash, for duplicate detection
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ingestion_jobs_audio ON ingestion_jobs (client_name, audio_sha256)"
+        )
+        self._conn.commit()
+
+    def create(self, client_name, folder_path, file_name, audio_sha256=None, trace_id=None):
+        job_id = str(uuid.uuid4())
+        now = datetime.now().isoformat()
+        stages = {stage: {"status": "pending"} for stage in STAGES}
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO ingestion_jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, client_name, folder_path, file_name, audio_sha256, None, "queued",
+                 json.dumps(stages), None, now, now, trace_id)
+            )
+            self._conn.commit()
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM ingestion_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["stages"] = json.loads(job["stages"])
+        return job
+
+    def find_by_audio(self, client_name, audio_sha256):
+        """Latest job for the same recording from this client that hasn't failed, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT job_id FROM ingestion_jobs WHERE client_name = ? AND audio_sha256 = ? "
+                "AND status != 'failed' ORDER BY created_at DESC LIMIT 1",
+                (client_name, audio_sha256)
+            ).fetchone()
+        return self.get(row["job_id"]) if row else None
+
+    def set_status(self, job_id, status, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, error, datetime.now().isoformat(), job_id)
+            )
+            self._conn.commit()
+
+    def set_asr_job(self, job_id, asr_job_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET asr_job_id = ?, updated_at = ? WHERE job_id = ?",
+                (asr_job_id, datetime.now().isoformat(), job_id)
+            )
+            self._conn.commit()
+
+    def set_stage(self, job_id, stage, status):
+        """Record a stage transition; returns the stage's entry with its timestamps."""
+        now = datetime.now().isoformat()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stages FROM ingestion_jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+            stages = json.loads(row["stages"])
+            entry = stages.setdefault(stage, {})
+            entry["status"] = status
+            if status == "running":
+                entry["started_at"] = now
+            else:
+                entry["finished_at"] = now
+            self._conn.execute(
+                "UPDATE ingestion_jobs SET stages = ?, updated_at = ? WHERE job_id = ?",
+                (json.dumps(stages), now, job_id)
+            )
+            self._conn.commit()
+        return entry
+
+    def unfinished(self):
+        """Jobs that were queued or mid-flight when the process last stopped."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM ingestion_jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [row["job_id"] for row in rows]
+
+
+class IngestionWorkers:
+    """Runs ingestion jobs from a JobStore on a bounded background pool.
+
+    A job runs in two halves. ``start`` fetches the audio and submits it to
+    ASR; the worker thread is then released while ``completions`` waits for
+    the transcription, and ``finish`` is queued once it is done.
+    """
+
+    def __init__(self, store, start, finish, completions, max_workers=2):
+        self.store = store
+        self.start = start
+        self.finish = finish
+        self.completions = completions
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="ingest"
+        )
+
+    def submit(self, job_id):
+        return self.executor.submit(self._start, job_id)
+
+    def resume(self):
+        """Requeue jobs left unfinished by a previous process."""
+        job_ids = self.store.unfinished()
+        for job_id in job_ids:
+            job = self.store.get(job_id)
+            if (job["asr_job_id"] or "").startswith(LIVE_JOB_PREFIX):
+                # The live transcription died with the process; transcribe the stored recording instead
+                self.submit(job_id)
+            elif job["asr_job_id"] and job["stages"]["transcribe"]["status"] == "running":
+                # Already handed to ASR; just wait for it again
+                self._watch(job_id, job["asr_job_id"])
+            else:
+                self.submit(job_id)
+        return len(job_ids)
+
+    def _stage_reporter(self, job_id, current, trace_id=None):
+        def on_stage(stage, status):
+            current["stage"] = stage
+            entry = self.store.set_stage(job_id, stage, status)
+            # Stage timestamps live in the store, so spans that cross halves, like transcribe, stay whole
+            if status != "running" and "started_at" in entry:
+                started = datetime.fromisoformat(entry["started_at"]).timestamp()
+                finished = datetime.fromisoformat(entry["finished_at"]).timestamp()
+                record_span(stage, finished - started, start=started, trace_id=trace_id, status=status)
+        return on_stage
+
+    def _fail(self, job_id, stage, error, trace_id=None):
+        if stage:
+            self._stage_reporter(job_id, {}, trace_id)(stage, "failed")
+        self.store.set_status(job_id, "failed", error=str(error))
+        print(f"Ingestion job {job_id} failed: {error}")
+
+    def _start(self, job_id):
+        job = self.store.get(job_id)
+        trace_id = job["trace_id"]
+        created = datetime.fromisoformat(job["created_at"]).timestamp()
+        record_span("queue_wait", datetime.now().timestamp() - created, start=created, trace_id=trace_id)
+        self.store.set_status(job_id, "running")
+        current = {}
+        try:
+            with trace(trace_id):
+                asr_job_id = self.start(job["client_name"], job["folder_path"], job["file_name"],
+                                        on_stage=self._stage_reporter(job_id, current, trace_id),
+                                        audio_sha256=job["audio_sha256"])
+        except Exception as e:
+            self._fail(job_id, current.get("stage"), e, trace_id)
+            return
+        self.store.set_asr_job(job_id, asr_job_id)
+        self._watch(job_id, asr_job_id)
+
+    def submit_transcribed(self, job_id, asr_job_id, transcribed):
+        """Queue a job whose transcript is being produced elsewhere, like a live stream.
+
+        transcribed is a concurrent.futures.Future; once it resolves only the
+        second half runs. If it fails, the job falls back to the full pipeline.
+        """
+        job = self.store.get(job_id)
+        self.store.set_status(job_id, "running")
+        self.store.set_asr_job(job_id, asr_job_id)
+        on_stage = self._stage_reporter(job_id, {}, job["trace_id"])
+        on_stage("download", "completed")
+        on_stage("transcribe", "running")
+
+        def transcribed_done(future):
+            error = future.exception()
+            if error is None:
+                self.executor.submit(self._finish, job_id)
+                return
+            print(f"Live transcription for job {job_id} failed, transcribing the recording instead: {error}")
+            self.submit(job_id)
+
+        transcribed.add_done_callback(transcribed_done)
+
+    def _watch(self, job_id, asr_job_id):
+        def transcribed(future):
+            error = future.exception()
+            if error is not None:
+                self._fail(job_id, "transcribe", error, self.store.get(job_id)["trace_id"])
+            else:
+                self.executor.submit(self._finish, job_id)
+
+        self.completions.watch(asr_job_id).add_done_callback(transcribed)
+
+    def _finish(self, job_id):
+        job = self.store.get(job_id)
+        trace_id = job["trace_id"]
+        current = {"stage": "transcribe"}
+        try:
+            with trace(trace_id):
+                self.finish(job["client_name"], job["folder_path"], job["asr_job_id"],
+                            on_stage=self._stage_reporter(job_id, current, trace_id),
+                            audio_sha256=job["audio_sha256"])
+            self.store.set_status(job_id, "completed")
+            created = datetime.fromisoformat(job["created_at"]).timestamp()
+            record_span("total", datetime.now().timestamp() - created, start=created, trace_id=trace_id)
+        except Exception as e:
+            # Tail stages run concurrently, so the failing one is named on the error
+            self._fail(job_id, getattr(e, "stage", current.get("stage")), e, trace_id)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,234 @@
+"""Transcription and rolling notes for a meeting while it is still being recorded.
+
+The extension streams timesliced MediaRecorder chunks as they are produced.
+A LiveStream pipes them, in order, through one ffmpeg process that decodes
+the container incrementally to 16 kHz mono PCM. Every LIVE_SEGMENT_SECONDS
+of decoded audio is cut into a WAV segment and sent to ASR straight away,
+and each transcribed segment gets its map-step notes. Segments are sent
+under the stream's ASR session, so a speaker keeps one label for the whole
+meeting rather than being clustered afresh every segment. When the meeting
+ends only the last segment and the reduce call remain, so the transcript
+and summary are ready seconds after the recording stops. Meetings short
+enough for a single analysis call skip the reduce and are analysed whole
+by the ingestion job, as uploaded recordings are.
+"""
+import os
+import json
+import time
+import wave
+import asyncio
+import threading
+import subprocess
+import audio_cache
+from http_client import http
+from asr_jobs import submit_transcription, fetch_transcript, completions, ASR_DEADLINE_SECONDS
+from tracing import trace, record_span
+from transcript import transcript_lines
+
+LIVE_SEGMENT_SECONDS = float(os.getenv("LIVE_SEGMENT_SECONDS", 60))
+# How long end() waits for chunks still in flight before giving up on the live transcript
+LIVE_DRAIN_SECONDS = float(os.getenv("LIVE_DRAIN_SECONDS", 30))
+LIVE_DIR = audio_cache.AUDIO_CACHE_DIR / "live"
+LIVE_DIR.mkdir(parents=True, exist_ok=True)
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+BYTES_PER_SECOND = SAMPLE_RATE * SAMPLE_WIDTH
+DECODER_COMMAND = [
+    "ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+    "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1",
+]
+READ_BLOCK_SIZE = 64 * 1024
+# Chunks held back waiting for an earlier one; past this the live path gives up and the
+# recording is transcribed whole once the stream ends
+LIVE_REORDER_WINDOW = int(os.getenv("LIVE_REORDER_WINDOW", 120))
+
+
+class LiveTranscriptionFailed(RuntimeError):
+    pass
+
+
+def transcript_path(stream_id):
+    return LIVE_DIR / f"{stream_id}.json"
+
+
+def load_transcript(stream_id):
+    return json.loads(transcript_path(stream_id).read_text(encoding="utf-8"))
+
+
+def discard_transcript(stream_id):
+    transcript_path(stream_id).unlink(missing_ok=True)
+
+
+def shift_segments(segments, offset):
+    # ASR times are relative to the segment's WAV; move them onto the meeting's clock
+    for seg in segments:
+        seg["start"] += offset
+        seg["end"] += offset
+        for word in seg.get("words") or []:
+            word["start"] += offset
+            word["end"] += offset
+    return segments
+
+
+class LiveStream:
+    """Incremental decode, ASR and map-step notes for one meeting being recorded.
+
+    feed() may be called from any thread and with chunks out of order;
+    chunks reach the decoder strictly by sequence number. end() returns a
+    concurrent.futures.Future for the merged transcript. For meetings long
+    enough to be map-reduced (uses_map_reduce), it also primes the analysis
+    cache so the ingestion job's analyze stage is a cache hit.
+    """
+
+    def __init__(self, stream_id, client_name, summarizer, cache_analysis, uses_map_reduce, trace_id=None):
+        self.stream_id = stream_id
+        self.client_name = client_name
+        self.summarizer = summarizer
+        self.cache_analysis = cache_analysis
+        self.uses_map_reduce = uses_map_reduce
+        self.trace_id = trace_id
+        self.work_dir = LIVE_DIR / stream_id
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        self.pcm_path = self.work_dir / "audio.pcm"
+
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._next_seq = 1
+        self._decoded = 0
+        self._cut_at = 0
+        # One future per segment, in order, resolving to its transcript; notes by segment index
+        self.segments = []
+        self.notes = {}
+
+        self.decoder = subprocess.Popen(DECODER_COMMAND, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self._reader = threading.Thread(target=self._read_pcm, name=f"live-{stream_id[:8]}", daemon=True)
+        self._reader.start()
+
+    def feed(self, seq, data):
+        """Queue chunk seq for the decoder; chunks already passed to it are ignored."""
+        with self._cond:
+            if seq < self._next_seq:
+                return
+            if seq >= self._next_seq + LIVE_REORDER_WINDOW:
+                raise LiveTranscriptionFailed(f"Chunk {seq} is too far ahead of chunk {self._next_seq}")
+            self._pending[seq] = data
+            while self._next_seq in self._pending:
+                chunk = self._pending.pop(self._next_seq)
+                try:
+                    self.decoder.stdin.write(chunk)
+                    self.decoder.stdin.flush()
+                except BrokenPipeError:
+                    raise LiveTranscriptionFailed("Audio decoder exited")
+                self._next_seq += 1
+            self._cond.notify_all()
+
+    def _read_pcm(self):
+        with open(self.pcm_path, "wb") as pcm:
+            while True:
+                block = self.decoder.stdout.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                pcm.write(block)
+                pcm.flush()
+                self._decoded += len(block)
+                if self._decoded - self._cut_at >= LIVE_SEGMENT_SECONDS * BYTES_PER_SECOND:
+                    self._cut(self._decoded)
+
+    def _cut(self, end):
+        """Write the decoded audio since the last cut as a WAV segment and start transcribing it."""
+        start = self._cut_at
+        # Whole samples only, so the next segment starts on a sample boundary
+        end -= (end - start) % SAMPLE_WIDTH
+        if end <= start:
+            return
+        self._cut_at = end
+        index = len(self.segments)
+        wav_path = self.work_dir / f"segment_{index:04d}.wav"
+        with open(self.pcm_path, "rb") as pcm, wave.open(str(wav_path), "wb") as wav:
+            pcm.seek(start)
+            wav.setnchannels(1)
+            wav.setsampwidth(SAMPLE_WIDTH)
+            wav.setframerate(SAMPLE_RATE)
+            wav.writeframes(pcm.read(end - start))
+        self.segments.append(http.spawn(self._transcribe(index, wav_path, start / BYTES_PER_SECOND)))
+
+    async def _transcribe(self, index, wav_path, offset):
+        started = time.time()
+        with trace(self.trace_id):
+            asr_job_id = await asyncio.to_thread(
+                submit_transcription, str(wav_path), self.client_name, self.stream_id
+            )
+            await completions.wait(asr_job_id, time.time() + ASR_DEADLINE_SECONDS)
+            segments = shift_segments(await asyncio.to_thread(fetch_transcript, asr_job_id), offset)
+            record_span("live.segment", time.time() - started, start=started, segment=index)
+        wav_path.unlink(missing_ok=True)
+
+        # Map-step notes for this stretch of the meeting, so only the reduce is left at the end
+        lines = transcript_lines(segments)
+        if lines:
+            self.notes[index] = await self.summarizer.map_part("\n".join(lines), index + 1)
+        return segments
+
+    def progress(self):
+        """What has been decoded and transcribed so far, with the rolling notes."""
+        notes = dict(list(self.notes.items()))
+        return {
+            "decoded_seconds": round(self._decoded / BYTES_PER_SECOND, 1),
+            "segments": len(self.segments),
+            "transcribed_segments": sum(1 for f in self.segments if f.done() and f.exception() is None),
+            "notes": [notes[i] for i in sorted(notes)],
+        }
+
+    def end(self, total_chunks):
+        """Flush the decoder once chunks 1..total_chunks have been fed; returns a Future for the transcript."""
+        with self._cond:
+            fed = self._cond.wait_for(lambda: self._next_seq > total_chunks, timeout=LIVE_DRAIN_SECONDS)
+        self.decoder.stdin.close()
+        self._reader.join()
+        self.decoder.wait()
+        if not fed or self.decoder.returncode != 0:
+            self.close()
+            raise LiveTranscriptionFailed(
+                f"Live decode incomplete (fed {self._next_seq - 1}/{total_chunks}, ffmpeg {self.decoder.returncode})"
+            )
+        # The tail of the meeting, shorter than a full segment
+        self._cut(self._decoded)
+        return http.spawn(self._finish())
+
+    async def _finish(self):
+        try:
+            results = await asyncio.gather(*(asyncio.wrap_future(f) for f in self.segments))
+            transcript = [seg for segments in results for seg in segments]
+            partials = [self.notes[i] for i in sorted(self.notes)]
+            # A short meeting gets one call over the whole transcript from the ingestion job instead
+            if partials and self.uses_map_reduce(transcript_lines(transcript)):
+                started = time.time()
+                with trace(self.trace_id):
+                    content = await self.summarizer.reduce(partials)
+                    record_span("live.reduce", time.time() - started, start=started, parts=len(partials))
+                await asyncio.to_thread(self.cache_analysis, transcript, content)
+            await asyncio.to_thread(
+                transcript_path(self.stream_id).write_text, json.dumps(transcript), "utf-8"
+            )
+            return transcript
+        finally:
+            self.close()
+
+    def cancel(self, transcribed):
+        """Abandon an ended stream nobody will ingest: stop its segments and drop the transcript."""
+        # Cancelled segments end _finish early; once it is done nothing writes the transcript again
+        for future in self.segments:
+            future.cancel()
+        transcribed.add_done_callback(lambda _: discard_transcript(self.stream_id))
+
+    def close(self):
+        """Stop the decoder and drop the stream's scratch files; the transcript file is kept."""
+        if self.decoder.poll() is None:
+            self.decoder.kill()
+        for path in self.work_dir.glob("*"):
+            path.unlink(missing_ok=True)
+        try:
+            self.work_dir.rmdir()
+        except OSError:
+            pass
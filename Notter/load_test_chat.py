@@ -0,0 +1,121 @@
+"""Chat latency while large uploads are in flight, against a running Notter.
+
+Measures request latency on a light endpoint (``/notter/chat`` by default)
+on its own, then again while several large synthetic recordings are being
+posted to ``/notter/upload-audio``. With the blocking upload work on the
+io and cpu pools the two sets of percentiles should stay close; the pool
+metrics printed at the end show where the uploads spent their time.
+
+Every upload becomes a real meeting and ingestion job, so run this only
+against a throwaway deployment: Notter with STORAGE_BACKEND=local and
+LOCAL_STORAGE_ROOT, INGEST_DB and CATALOG_DB in a scratch directory, with
+ASR_BASE_URL pointing at stub_asr.py and OPENAI_BASE_URL at stub_llm.py:
+
+    uvicorn stub_asr:app --port 8090
+    uvicorn stub_llm:app --port 8089
+    python load_test_chat.py --uploads 8 --upload-mb 50
+
+The script refuses to start unless the stub ASR at ``--asr-url`` answers,
+and reports how many jobs it received. Use ``--path`` to probe another
+endpoint when the chat backend is not reachable.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import sys
+import argparse
+import statistics
+import httpx
+
+BASE_URL = os.getenv("NOTTER_URL", "http://127.0.0.1:8000")
+STUB_ASR_URL = os.getenv("STUB_ASR_URL", "http://127.0.0.1:8090")
+
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"n": 0}
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "n": len(ordered),
+        "p50_ms": round(statistics.median(ordered) * 1000, 1),
+        "p95_ms": round(pick(0.95) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+async def probe(client, path, duration, interval):
+    """Send one request every ``interval`` seconds for ``duration`` seconds; returns latencies."""
+    latencies = []
+    deadline = time.time() + duration
+    while time.time() < deadline:
+        started = time.time()
+        if path == "/notter/chat":
+            await client.post(path, json={"message": "What were the action items?"})
+        else:
+            await client.get(path)
+        latencies.append(time.time() - started)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def upload(client, index, size_mb):
+    # Random bytes so every upload hashes differently and none is deduplicated
+    body = os.urandom(size_mb * 1024 * 1024)
+    metadata = {"clientName": "loadtest", "fileName": "audio.webm",
+                "folderPath": f"kapture/loadtest-{uuid.uuid4().hex[:8]}"}
+    started = time.time()
+    response = await client.post(
+        "/notter/upload-audio",
+        files={"audio": (f"load-{index}.webm", body, "audio/webm")},
+        data={"metadata": json.dumps(metadata)},
+    )
+    return response.status_code, time.time() - started
+
+
+async def stub_asr_stats(asr_url):
+    try:
+        async with httpx.AsyncClient(base_url=asr_url, timeout=10) as client:
+            response = await client.get("/stats")
+            response.raise_for_status()
+            return response.json()
+    except httpx.HTTPError as e:
+        sys.exit(f"No stub ASR at {asr_url} ({e}); start stub_asr.py and point Notter's ASR_BASE_URL at it")
+
+
+async def main(args):
+    asr_before = await stub_asr_stats(args.asr_url)
+    async with httpx.AsyncClient(base_url=args.url, timeout=600) as client:
+        baseline = await probe(client, args.path, args.duration, args.interval)
+
+        uploads = asyncio.gather(*(upload(client, i, args.upload_mb) for i in range(args.uploads)))
+        # Give the uploads a moment to start streaming before probing
+        await asyncio.sleep(0.5)
+        loaded = await probe(client, args.path, args.duration, args.interval)
+        results = await uploads
+
+        pools = (await client.get("/notter/metrics/pools")).json()
+    asr_after = await stub_asr_stats(args.asr_url)
+
+    print(f"{args.path} latency, idle:          {percentiles(baseline)}")
+    print(f"{args.path} latency, {args.uploads} uploads: {percentiles(loaded)}")
+    for status, seconds in results:
+        print(f"  upload {args.upload_mb} MB -> {status} in {seconds:.1f}s")
+    for pool in pools["pools"]:
+        print(f"  pool {pool['pool']}: {pool}")
+    # Ingestion runs in the background, so jobs may still be reaching the stub
+    print(f"  stub ASR received {asr_after['jobs'] - asr_before['jobs']} jobs so far")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=BASE_URL)
+    parser.add_argument("--asr-url", default=STUB_ASR_URL)
+    parser.add_argument("--path", default="/notter/chat")
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--upload-mb", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--interval", type=float, default=0.1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,265 @@
+"""Reprocess stored meetings in bulk, e.g. after changing the ASR model, the prompt or RAG chunking.
+
+Meetings are enumerated through the meeting catalog, not by listing the
+bucket. Each selected stage has its own worker pool; a meeting moves on to
+the next stage as soon as the previous one finishes. A stage is skipped
+when the hash of its inputs matches the one recorded the last time it ran,
+so repeated runs only redo what changed. Examples:
+
+    python reprocess.py --stages analyze,rag
+    python reprocess.py --stages analytics          # backfill analytics.json for older meetings
+    python reprocess.py --stages transcribe,analyze,rag --client acme --concurrency transcribe=2,analyze=8
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import argparse
+import threading
+import concurrent.futures
+from pathlib import Path
+
+import KapNotes
+from KapNotes import blob_store, workspaces
+from catalog import MeetingCatalog
+from analytics import ANALYTICS_VERSION
+
+STAGE_ORDER = ["transcribe", "analyze", "rag", "analytics"]
+DEFAULT_CONCURRENCY = {"transcribe": 2, "analyze": 8, "rag": 4, "analytics": 4}
+# Bump to force a stage to rerun everywhere, e.g. after changing the ASR model or RAG chunking
+STAGE_VERSIONS = {
+    "transcribe": os.getenv("REPROCESS_ASR_VERSION", "1"),
+    "analyze": "1",
+    "rag": os.getenv("REPROCESS_RAG_VERSION", "1"),
+    "analytics": str(ANALYTICS_VERSION),
+}
+REPORT_SECONDS = 10
+
+
+def content_hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class StageState:
+    """Input hash each stage last completed with, per meeting, in a local SQLite file."""
+
+    def __init__(self, db_path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS stage_inputs (
+                meeting TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                finished_at REAL NOT NULL,
+                PRIMARY KEY (meeting, stage)
+            )"""
+        )
+        self._conn.commit()
+
+    def is_current(self, meeting, stage, input_hash):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT input_hash FROM stage_inputs WHERE meeting = ? AND stage = ?", (meeting, stage)
+            ).fetchone()
+        return row is not None and row[0] == input_hash
+
+    def record(self, meeting, stage, input_hash):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stage_inputs VALUES (?, ?, ?, ?)",
+                (meeting, stage, input_hash, time.time())
+            )
+            self._conn.commit()
+
+
+# Each stage is a pair: prepare(meeting) -> (input_hash, context), run(meeting, context)
+
+def prepare_transcribe(meeting):
+    audio = next(iter(blob_store.list(f"{meeting}/audio.")), None)
+    if audio is None:
+        raise FileNotFoundError(f"No audio in {meeting}")
+    # The store's checksum (crc32c in GCS) tells a re-uploaded recording apart without downloading it
+    return content_hash(audio.name, audio.size, audio.checksum, STAGE_VERSIONS["transcribe"]), audio
+
+
+def run_transcribe(meeting, audio):
+    with workspaces.workspace(meeting) as workspace:
+        local_path = workspace.file(Path(audio.name).name)
+        KapNotes.download_from_bucket(audio.name, local_path, None, workspace)
+        transcription = KapNotes.call_transcriber(KapNotes.prepare_for_asr(local_path, workspace))
+    blob_store.write_text(f"{meeting}/transcription.txt", json.dumps(transcription))
+
+
+def prepare_analyze(meeting):
+    transcription = json.loads(blob_store.read_text(f"{meeting}/transcription.txt"))
+    lines = KapNotes.transcript_lines(transcription)
+    input_hash = content_hash("\n".join(lines), KapNotes.LLM_MODEL, KapNotes.analysis_settings(),
+                              STAGE_VERSIONS["analyze"])
+    return input_hash, transcription
+
+
+def run_analyze(meeting, transcription):
+    notes = KapNotes.analyze_transcript(transcription)
+    blob_store.write_many([
+        (f"{meeting}/summary.json", json.dumps(notes, ensure_ascii=False), "application/json"),
+        (f"{meeting}/summary.txt", KapNotes.render_summary_text(notes), "text/plain"),
+    ])
+
+
+def prepare_rag(meeting):
+    summary = blob_store.read_text(f"{meeting}/summary.txt")
+    client_name = meeting.split("/")[0]
+    return content_hash(summary, client_name, STAGE_VERSIONS["rag"]), (summary, client_name)
+
+
+def run_rag(meeting, context):
+    summary, client_name = context
+    # Keyed by meeting, so ConvEng replaces the chunks from the previous run instead of adding more
+    KapNotes.add_to_rag(summary, client_name, meeting)
+
+
+def prepare_analytics(meeting):
+    transcription_string = blob_store.read_text(f"{meeting}/transcription.txt")
+    return content_hash(transcription_string, STAGE_VERSIONS["analytics"]), json.loads(transcription_string)
+
+
+def run_analytics(meeting, transcription):
+    KapNotes.store_analytics(meeting, transcription)
+
+
+STAGES = {
+    "transcribe": (prepare_transcribe, run_transcribe),
+    "analyze": (prepare_analyze, run_analyze),
+    "rag": (prepare_rag, run_rag),
+    "analytics": (prepare_analytics, run_analytics),
+}
+
+
+def iter_meetings(catalog, clients=None):
+    for client in clients or catalog.children(""):
+        for date in catalog.children(client):
+            for meeting in catalog.children(f"{client}/{date}"):
+                yield f"{client}/{date}/{meeting}"
+
+
+class Reprocessor:
+    """Moves meetings through the selected stages, each stage on its own bounded pool."""
+
+    def __init__(self, stages, concurrency, state, force=False):
+        self.stages = stages
+        self.state = state
+        self.force = force
+        self.pools = {
+            stage: concurrent.futures.ThreadPoolExecutor(
+                max_workers=concurrency.get(stage, DEFAULT_CONCURRENCY[stage]), thread_name_prefix=stage
+            )
+            for stage in stages
+        }
+        self.counts = {stage: {"ran": 0, "skipped": 0, "failed": 0} for stage in stages}
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._done = threading.Event()
+
+    def _count(self, stage, outcome):
+        with self._lock:
+            self.counts[stage][outcome] += 1
+
+    def _finish_meeting(self):
+        with self._lock:
+            self._remaining -= 1
+            if self._remaining == 0:
+                self._done.set()
+
+    def _run_stage(self, meeting, index):
+        stage = self.stages[index]
+        prepare, run = STAGES[stage]
+        try:
+            input_hash, context = prepare(meeting)
+            if not self.force and self.state.is_current(meeting, stage, input_hash):
+                self._count(stage, "skipped")
+            else:
+                run(meeting, context)
+                self.state.record(meeting, stage, input_hash)
+                self._count(stage, "ran")
+        except Exception as e:
+            print(f"{meeting}: {stage} failed: {e}", file=sys.stderr)
+            self._count(stage, "failed")
+            self._finish_meeting()
+            return
+        if index + 1 < len(self.stages):
+            self.pools[self.stages[index + 1]].submit(self._run_stage, meeting, index + 1)
+        else:
+            self._finish_meeting()
+
+    def run(self, meetings):
+        meetings = list(meetings)
+        if not meetings:
+            return
+        self._remaining = len(meetings)
+        started = time.time()
+        for meeting in meetings:
+            self.pools[self.stages[0]].submit(self._run_stage, meeting, 0)
+        while not self._done.wait(REPORT_SECONDS):
+            self.report(len(meetings), started)
+        self.report(len(meetings), started)
+        for pool in self.pools.values():
+            pool.shutdown()
+
+    def report(self, total, started):
+        with self._lock:
+            done = total - self._remaining
+            counts = "  ".join(
+                f"{stage} {c['ran']} ran/{c['skipped']} skipped/{c['failed']} failed"
+                for stage, c in self.counts.items()
+            )
+        elapsed = time.time() - started
+        rate = done / elapsed if elapsed else 0.0
+        eta = (total - done) / rate if rate else float("inf")
+        eta_text = f"{eta / 60:.1f}m" if eta != float("inf") else "?"
+        print(f"[{elapsed / 60:.1f}m] {done}/{total} meetings, {rate * 60:.1f}/min, ETA {eta_text} | {counts}")
+
+
+def parse_concurrency(text):
+    concurrency = {}
+    for item in filter(None, (text or "").split(",")):
+        stage, _, value = item.partition("=")
+        if stage not in STAGES:
+            raise argparse.ArgumentTypeError(f"Unknown stage {stage}")
+        concurrency[stage] = int(value)
+    return concurrency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocess stored meetings in bulk.")
+    parser.add_argument("--stages", default="analyze,rag",
+                        help=f"comma-separated subset of {','.join(STAGE_ORDER)}")
+    parser.add_argument("--client", action="append", help="only these clients (repeatable)")
+    parser.add_argument("--concurrency", type=parse_concurrency, default={},
+                        help="per-stage workers, e.g. transcribe=2,analyze=8,rag=4")
+    parser.add_argument("--force", action="store_true", help="rerun stages even if their inputs are unchanged")
+    parser.add_argument("--state-db", default=os.getenv("REPROCESS_DB", "reprocess_state.db"))
+    args = parser.parse_args()
+
+    selected = set(filter(None, args.stages.split(",")))
+    unknown = selected - set(STAGE_ORDER)
+    if unknown:
+        parser.error(f"Unknown stages: {', '.join(sorted(unknown))}")
+    stages = [stage for stage in STAGE_ORDER if stage in selected]
+    if not stages:
+        parser.error("No stages selected")
+
+    catalog = MeetingCatalog(os.getenv("CATALOG_DB", "meeting_catalog.db"), blob_store)
+    meetings = iter_meetings(catalog, args.client)
+    Reprocessor(stages, args.concurrency, StageState(args.state_db), force=args.force).run(meetings)
+
+
+if __name__ == "__main__":
+    main()
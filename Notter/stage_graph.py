@@ -0,0 +1,105 @@
+import time
+import random
+import contextvars
+import concurrent.futures
+
+
+class StageFailed(RuntimeError):
+    """A stage gave up after its retries; ``stage`` names it for job reporting."""
+
+    def __init__(self, stage, error):
+        super().__init__(f"{stage}: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class Stage:
+    """One node of a StageGraph: fn(*args), run after every stage named in deps."""
+
+    def __init__(self, name, fn, *args, deps=(), retries=0, backoff=1.0):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.deps = tuple(deps)
+        self.retries = retries
+        self.backoff = backoff
+
+
+class StageGraph:
+    """Runs stages as soon as their dependencies finish, independent ones concurrently.
+
+    Each stage is retried up to its own ``retries`` with jittered exponential
+    backoff. Start, finish and attempt counts are kept per stage in
+    ``timings``. After a failure no new stages are started; the running
+    ones are allowed to finish and the first failure is raised as StageFailed.
+    """
+
+    def __init__(self, stages):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [dep for dep in stage.deps if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {missing}")
+        self.results = {}
+        self.timings = {}
+
+    def _attempt(self, stage, on_stage):
+        if on_stage:
+            on_stage(stage.name, "running")
+        timing = self.timings[stage.name] = {"started": time.time(), "attempts": 0}
+        for attempt in range(stage.retries + 1):
+            timing["attempts"] += 1
+            try:
+                result = stage.fn(*stage.args)
+                break
+            except Exception as e:
+                if attempt == stage.retries:
+                    timing["finished"] = time.time()
+                    raise StageFailed(stage.name, e) from e
+                delay = random.uniform(0, stage.backoff * 2 ** attempt)
+                print(f"Stage {stage.name} failed ({e}); retrying in {delay:.1f}s")
+                time.sleep(delay)
+        timing["finished"] = time.time()
+        if on_stage:
+            on_stage(stage.name, "completed")
+        return result
+
+    def run(self, on_stage=None):
+        """Run every stage; returns {name: result}."""
+        pending = dict(self.stages)
+        failure = None
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(pending) or 1) as executor:
+            running = {}
+            while pending or running:
+                if failure is None:
+                    ready = [s for s in pending.values() if all(d in self.results for d in s.deps)]
+                    for stage in ready:
+                        del pending[stage.name]
+                        # Each stage keeps the caller's context, e.g. the current trace
+                        context = contextvars.copy_context()
+                        running[executor.submit(context.run, self._attempt, stage, on_stage)] = stage.name
+                if not running:
+                    break
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        self.results[name] = future.result()
+                    except StageFailed as e:
+                        failure = failure or e
+        if failure is not None:
+            raise failure
+        return self.results
+
+    def report(self):
+        """One line with each stage's duration and the wall time of the whole graph."""
+        if not self.timings:
+            return "no stages run"
+        parts = []
+        for name, timing in self.timings.items():
+            duration = timing.get("finished", time.time()) - timing["started"]
+            retries = f" x{timing['attempts']}" if timing["attempts"] > 1 else ""
+            parts.append(f"{name} {duration:.2f}s{retries}")
+        started = min(t["started"] for t in self.timings.values())
+        finished = max(t.get("finished", time.time()) for t in self.timings.values())
+        return ", ".join(parts) + f"; wall {finished - started:.2f}s"
@@ -0,0 +1,93 @@
+"""Stand-in for the ASR service, for exercising ingestion without transcribing anything.
+
+Accepts uploads on the same routes as ASR/main.py and discards the audio
+after counting its bytes. Each job completes after STUB_ASR_SECONDS with a
+short placeholder transcript; the callback_url, when given, is notified as
+ASR would. GET /stats reports jobs and bytes received. Run it with
+``uvicorn stub_asr:app --port 8090`` and set
+ASR_BASE_URL=http://127.0.0.1:8090/.
+"""
+import os
+import uuid
+import asyncio
+from datetime import datetime
+from typing import Optional
+import httpx
+from fastapi import FastAPI, File, Form, HTTPException, UploadFile
+
+STUB_ASR_SECONDS = float(os.getenv("STUB_ASR_SECONDS", 2.0))
+READ_BLOCK_SIZE = 1024 * 1024
+
+app = FastAPI()
+
+jobs = {}
+stats = {"jobs": 0, "bytes": 0}
+
+
+def placeholder_transcript():
+    lines = [
+        ("SPEAKER_00", "Let's go through the release plan for this week."),
+        ("SPEAKER_01", "The upload changes are ready, I'll deploy them on Thursday."),
+        ("SPEAKER_00", "Good, and please send the load test numbers before then."),
+    ]
+    return [
+        {"start": i * 5.0, "end": i * 5.0 + 4.5, "speaker": speaker, "text": text, "words": []}
+        for i, (speaker, text) in enumerate(lines)
+    ]
+
+
+async def complete(job_id):
+    await asyncio.sleep(STUB_ASR_SECONDS)
+    job = jobs[job_id]
+    job.update(status="completed", progress=100, completed_at=datetime.now().isoformat())
+    if job.get("callback_url"):
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                await client.post(job["callback_url"], json=job)
+        except httpx.HTTPError as e:
+            print(f"Callback for job {job_id} failed: {e}")
+
+
+@app.post("/upload/")
+async def upload(file: UploadFile = File(...), callback_url: Optional[str] = Form(None),
+                 client_id: Optional[str] = Form(None), session_id: Optional[str] = Form(None),
+                 trace_id: Optional[str] = Form(None)):
+    size = 0
+    while True:
+        block = await file.read(READ_BLOCK_SIZE)
+        if not block:
+            break
+        size += len(block)
+    job_id = str(uuid.uuid4())
+    jobs[job_id] = {
+        "job_id": job_id,
+        "status": "processing",
+        "created_at": datetime.now().isoformat(),
+        "file_name": file.filename,
+        "progress": 0,
+        "callback_url": callback_url,
+        "trace_id": trace_id,
+    }
+    stats["jobs"] += 1
+    stats["bytes"] += size
+    asyncio.create_task(complete(job_id))
+    return jobs[job_id]
+
+
+@app.get("/status/{job_id}")
+async def status(job_id: str):
+    if job_id not in jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs[job_id]
+
+
+@app.get("/download/{job_id}")
+async def download(job_id: str):
+    if jobs.get(job_id, {}).get("status") != "completed":
+        raise HTTPException(status_code=400, detail="Transcription not completed")
+    return placeholder_transcript()
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
@@ -0,0 +1,97 @@
+"""Stand-in for the OpenAI chat completions endpoint, for exercising summarization offline.
+
+Each request sleeps for a latency modelled on a hosted LLM: a fixed
+overhead, a prefill cost per prompt token and a decode cost per generated
+token. It answers with placeholder notes in the usual section layout, or
+as summary.json fields when a JSON response_format is requested.
+GET /stats reports request counts and the peak number of concurrent
+requests. Run it with ``uvicorn stub_llm:app --port 8089`` and set
+OPENAI_BASE_URL=http://127.0.0.1:8089/v1.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+from fastapi import FastAPI
+from transcript import count_tokens
+
+BASE_SECONDS = float(os.getenv("STUB_LLM_BASE_SECONDS", 0.4))
+PREFILL_SECONDS_PER_TOKEN = float(os.getenv("STUB_LLM_PREFILL_SECONDS", 0.00002))
+DECODE_SECONDS_PER_TOKEN = float(os.getenv("STUB_LLM_DECODE_SECONDS", 0.01))
+
+app = FastAPI()
+
+stats = {"requests": 0, "in_flight": 0, "peak_in_flight": 0, "prompt_tokens": 0}
+
+
+def placeholder_notes(prompt, max_tokens):
+    words = prompt.split()
+    summary = " ".join(words[-min(len(words), 100):])
+    text = (
+        f"Summary\n{summary}\n\n"
+        "Key Points\n- Placeholder key point\n\n"
+        "Action Items\n- Placeholder action item"
+    )
+    # Trim to roughly max_tokens so decode time tracks the request
+    return " ".join(text.split(" ")[:max_tokens])
+
+
+def placeholder_json(prompt, max_tokens):
+    words = prompt.split()
+    return json.dumps({
+        "summary": " ".join(words[-min(len(words), min(100, max_tokens)):]),
+        "key_points": ["Placeholder key point"],
+        "action_items": [{"task": "Placeholder action item", "owner": None, "deadline": None}],
+    })
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: dict):
+    prompt = "\n".join(message.get("content") or "" for message in request.get("messages", []))
+    max_tokens = request.get("max_tokens") or 1500
+    prompt_tokens = count_tokens(prompt, request.get("model", "gpt-4o"))
+    if (request.get("response_format") or {}).get("type") in ("json_schema", "json_object"):
+        content = placeholder_json(prompt, max_tokens)
+    else:
+        content = placeholder_notes(prompt, max_tokens)
+    completion_tokens = count_tokens(content)
+
+    stats["requests"] += 1
+    stats["prompt_tokens"] += prompt_tokens
+    stats["in_flight"] += 1
+    stats["peak_in_flight"] = max(stats["peak_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(BASE_SECONDS
+                            + prompt_tokens * PREFILL_SECONDS_PER_TOKEN
+                            + completion_tokens * DECODE_SECONDS_PER_TOKEN)
+    finally:
+        stats["in_flight"] -= 1
+
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "gpt-4o"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+@app.post("/stats/reset")
+async def reset_stats():
+    stats.update(requests=0, in_flight=0, peak_in_flight=0, prompt_tokens=0)
+    return stats
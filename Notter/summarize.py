@@ -0,0 +1,95 @@
+import asyncio
+import time
+import openai
+from transcript import split_windows
+from summary_schema import RESPONSE_FORMAT
+
+MAP_PROMPT = (
+    "You are an assistant that processes meeting transcripts. "
+    "Below is {part} of a longer meeting. Write concise notes on this part only:\n\n"
+    "- What was discussed, in a few sentences\n"
+    "- Key points, as bullets\n"
+    "- Action items, as bullets with the responsible individuals and deadlines when stated\n\n"
+    "Keep speaker names exactly as written. Do not invent details that are not in this part.\n\n"
+    "Transcript part:\n"
+    "{transcript}"
+)
+
+REDUCE_PROMPT = (
+    "You are an assistant that processes meeting transcripts. "
+    "The notes below were written for consecutive parts of one meeting, in order. "
+    "Combine them into a single set of meeting notes as JSON with the following fields:\n\n"
+    "1. summary: A detailed summary overview of the conversation in 100-150 words\n"
+    "2. key_points: The critical discussions, one string per point.\n"
+    "3. action_items: The tasks assigned, each with its task, owner and deadline (null when not stated).\n\n"
+    "Merge duplicates across parts and keep the order in which things were discussed.\n\n"
+    "Notes:\n"
+    "{notes}\n\n"
+    "Dont use any astriks or markdown in the text."
+)
+
+
+class MapReduceSummarizer:
+    """Summarizes a long transcript by window, then merges the window notes in one reduce call.
+
+    Map calls run concurrently, at most ``concurrency`` at a time. The
+    OpenAI client honours OPENAI_BASE_URL, so pointing it at stub_llm.py
+    runs the whole thing offline.
+    """
+
+    def __init__(self, model, window_tokens=6000, concurrency=4, map_max_tokens=500, max_tokens=1500):
+        self.model = model
+        self.window_tokens = window_tokens
+        self.concurrency = concurrency
+        self.map_max_tokens = map_max_tokens
+        self.max_tokens = max_tokens
+        self._client = None
+
+    def _get_client(self):
+        # Created on first use so it binds to the loop the summaries run on
+        if self._client is None:
+            self._client = openai.AsyncOpenAI()
+        return self._client
+
+    async def complete(self, prompt, max_tokens, **kwargs):
+        response = await self._get_client().chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=max_tokens,
+            temperature=0.5,
+            **kwargs
+        )
+        return response.choices[0].message.content
+
+    async def map_part(self, transcript, index, total=None):
+        """Notes for one part of a meeting, as the map step writes them; total is None while it is still going."""
+        part = f"part {index} of {total}" if total else f"part {index}, the latest so far,"
+        prompt = MAP_PROMPT.format(part=part, transcript=transcript)
+        return await self.complete(prompt, self.map_max_tokens)
+
+    async def reduce(self, partials):
+        """Merge per-part notes, in meeting order, into the notes JSON."""
+        notes = "\n\n".join(f"Part {i + 1}:\n{partial}" for i, partial in enumerate(partials))
+        return await self.complete(REDUCE_PROMPT.format(notes=notes), self.max_tokens,
+                                   response_format=RESPONSE_FORMAT)
+
+    async def summarize(self, lines):
+        """Return (notes JSON, stats) for transcript lines; stats has window count and map/reduce timings."""
+        windows = split_windows(lines, self.window_tokens, self.model)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def map_window(index, window):
+            async with semaphore:
+                return await self.map_part(window, index + 1, len(windows))
+
+        started = time.time()
+        partials = await asyncio.gather(*(map_window(i, w) for i, w in enumerate(windows)))
+        mapped = time.time()
+
+        result = await self.reduce(partials)
+        stats = {
+            "windows": len(windows),
+            "map_seconds": mapped - started,
+            "reduce_seconds": time.time() - mapped,
+        }
+        return result, stats
@@ -0,0 +1,86 @@
+import json
+
+# Shape of summary.json; also sent to the model as a strict JSON schema
+SUMMARY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string"},
+        "key_points": {"type": "array", "items": {"type": "string"}},
+        "action_items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "task": {"type": "string"},
+                    "owner": {"type": ["string", "null"]},
+                    "deadline": {"type": ["string", "null"]},
+                },
+                "required": ["task", "owner", "deadline"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["summary", "key_points", "action_items"],
+    "additionalProperties": False,
+}
+
+RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "meeting_notes", "schema": SUMMARY_SCHEMA, "strict": True},
+}
+
+
+class InvalidSummary(ValueError):
+    pass
+
+
+def _check_string(value, where, nullable=False):
+    if value is None and nullable:
+        return
+    if not isinstance(value, str):
+        raise InvalidSummary(f"{where} must be a string")
+
+
+def validate_summary(data):
+    """Check model output against SUMMARY_SCHEMA; returns it unchanged or raises InvalidSummary."""
+    if not isinstance(data, dict):
+        raise InvalidSummary("summary must be an object")
+    missing = {"summary", "key_points", "action_items"} - set(data)
+    if missing:
+        raise InvalidSummary(f"summary is missing {', '.join(sorted(missing))}")
+    _check_string(data["summary"], "summary")
+    if not isinstance(data["key_points"], list):
+        raise InvalidSummary("key_points must be a list")
+    for i, point in enumerate(data["key_points"]):
+        _check_string(point, f"key_points[{i}]")
+    if not isinstance(data["action_items"], list):
+        raise InvalidSummary("action_items must be a list")
+    for i, item in enumerate(data["action_items"]):
+        if not isinstance(item, dict):
+            raise InvalidSummary(f"action_items[{i}] must be an object")
+        _check_string(item.get("task"), f"action_items[{i}].task")
+        _check_string(item.get("owner"), f"action_items[{i}].owner", nullable=True)
+        _check_string(item.get("deadline"), f"action_items[{i}].deadline", nullable=True)
+    return data
+
+
+def parse_summary(content):
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise InvalidSummary(f"model output is not JSON: {e}") from e
+    return validate_summary(data)
+
+
+def format_action_item(item):
+    details = [part for part in (item.get("owner"), item.get("deadline") and f"by {item['deadline']}") if part]
+    return f"{item['task']} ({', '.join(details)})" if details else item["task"]
+
+
+def render_summary_text(data):
+    """Plain-text notes in the Summary / Key Points / Action Items layout of summary.txt."""
+    lines = ["Summary:", data["summary"].strip(), "", "Key Points:"]
+    lines += [f"- {point}" for point in data["key_points"]]
+    lines += ["", "Action Items:"]
+    lines += [f"- {format_action_item(item)}" for item in data["action_items"]]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,214 @@
+"""Many ingestions at once against local storage, with stand-ins for ASR and the LLM.
+
+Everything KapNotes shares between jobs is real: the local bucket, the
+workspace root and its quota, the upload audio cache and the analysis
+cache. Only the network calls are replaced: ASR by a stand-in that reads
+the submitted audio and answers with a transcript naming the meeting, the
+LLM by stub_llm's placeholder notes, and the RAG ingest by a recorder.
+
+    python -m pytest test_concurrent_ingestion.py
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+SCRATCH = tempfile.mkdtemp(prefix="notter-ingestion-test-")
+AUDIO_BYTES = 256 * 1024
+
+# Configure everything KapNotes reads at import time before importing it
+os.environ.update({
+    "STORAGE_BACKEND": "local",
+    "LOCAL_STORAGE_ROOT": os.path.join(SCRATCH, "bucket"),
+    "WORKSPACE_ROOT": os.path.join(SCRATCH, "workspaces"),
+    "WORKSPACE_QUOTA_BYTES": str(int(AUDIO_BYTES * 2.5)),
+    "AUDIO_CACHE_DIR": os.path.join(SCRATCH, "audio_cache"),
+    "LLM_CACHE_DB": os.path.join(SCRATCH, "llm_cache.db"),
+})
+
+import openai
+import KapNotes
+import audio_cache
+from stub_llm import placeholder_json
+from workspace import WorkspaceQuotaExceeded
+
+
+def disk_usage(root):
+    return sum(path.stat().st_size for path in Path(root).rglob("*") if path.is_file())
+
+
+class StandInAsr:
+    """Takes the place of the ASR service and the completion waiter."""
+
+    def __init__(self, on_submit=None, latency=0.3):
+        self.on_submit = on_submit
+        self.latency = latency
+        self.submitted = {}
+        self._lock = threading.Lock()
+
+    def submit_transcription(self, audio_path, client_id=None, session_id=None):
+        # Called with the workspace still held; the audio names its meeting
+        if self.on_submit:
+            self.on_submit(audio_path)
+        marker = Path(audio_path).read_bytes().split(b"\n", 1)[0].decode()
+        with self._lock:
+            job_id = f"asr-{len(self.submitted)}"
+            self.submitted[job_id] = marker
+        return job_id
+
+    def wait_blocking(self, asr_job_id, deadline=None):
+        # Linger so the ingestions overlap
+        time.sleep(self.latency)
+        return {"status": "completed"}
+
+    def fetch_transcript(self, asr_job_id):
+        marker = self.submitted[asr_job_id]
+        return [
+            {"start": 0.0, "end": 4.0, "speaker": "SPEAKER_00", "text": f"Welcome to {marker}.", "words": []},
+            {"start": 4.0, "end": 9.0, "speaker": "SPEAKER_01", "text": "I will send the notes today.", "words": []},
+        ]
+
+    def fetch_status(self, asr_job_id):
+        return {"status": "completed", "timings": {}}
+
+    def patches(self):
+        return [
+            mock.patch.object(KapNotes, "submit_transcription", self.submit_transcription),
+            mock.patch.object(KapNotes, "completions", self),
+            mock.patch.object(KapNotes, "fetch_transcript", self.fetch_transcript),
+            mock.patch.object(KapNotes, "fetch_status", self.fetch_status),
+        ]
+
+
+def stand_in_llm(model, messages, max_tokens, **kwargs):
+    content = placeholder_json(messages[0]["content"], max_tokens)
+    message = mock.Mock(content=content)
+    return mock.Mock(choices=[mock.Mock(message=message)])
+
+
+class IngestionTestCase(unittest.TestCase):
+    def start_patches(self, patches):
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def upload(self, client_name, folder, body):
+        """What /notter/upload-audio leaves behind: the stored object and the spooled copy."""
+        KapNotes.blob_store.write_text(f"{folder}/audio.wav", body.decode())
+        sha256, _ = audio_cache.spool_to_cache(_Reader(body), ".wav", client_name)
+        return sha256
+
+    def assertWorkspacesReleased(self):
+        self.assertEqual(KapNotes.workspaces.usage(), 0)
+        self.assertEqual(list(Path(os.environ["WORKSPACE_ROOT"]).iterdir()), [])
+
+
+class _Reader:
+    def __init__(self, body):
+        self.body = body
+
+    def read(self, size):
+        block, self.body = self.body[:size], self.body[size:]
+        return block
+
+
+class ConcurrentCallAllTest(IngestionTestCase):
+    MEETINGS = 6
+
+    def setUp(self):
+        self.asr = StandInAsr()
+        self.rag = []
+        self.downloads = []
+        download_file = KapNotes.blob_store.download_file
+
+        def count_download(name, path):
+            self.downloads.append(name)
+            return download_file(name, path)
+
+        self.start_patches(self.asr.patches() + [
+            mock.patch.object(openai.chat.completions, "create", stand_in_llm),
+            mock.patch.object(KapNotes, "add_to_rag", lambda text, client, folder: self.rag.append((client, folder))),
+            mock.patch.object(KapNotes.blob_store, "download_file", count_download),
+        ])
+
+    def test_parallel_meetings_keep_their_own_outputs(self):
+        meetings = []
+        for i in range(self.MEETINGS):
+            # The last two clients upload the same recording, which shares a hash but not a cache entry
+            client_name = f"client-{i}"
+            marker = f"meeting {min(i, self.MEETINGS - 2)}"
+            folder = f"{client_name}/2024-01-01/meeting_1"
+            body = (marker + "\n").encode() + b"x" * 4096
+            meetings.append((client_name, folder, marker, self.upload(client_name, folder, body)))
+
+        def ingest(meeting):
+            client_name, folder, _, sha256 = meeting
+            return KapNotes.call_all(client_name, folder, "audio.wav", audio_sha256=sha256)
+
+        with ThreadPoolExecutor(max_workers=self.MEETINGS) as pool:
+            list(pool.map(ingest, meetings))
+
+        for client_name, folder, marker, sha256 in meetings:
+            notes = json.loads(KapNotes.blob_store.read_text(f"{folder}/summary.json"))
+            self.assertIn(marker, notes["summary"])
+            self.assertIn(marker, KapNotes.blob_store.read_text(f"{folder}/transcription.txt"))
+            analytics = json.loads(KapNotes.blob_store.read_text(f"{folder}/analytics.json"))
+            self.assertEqual(len(analytics["speakers"]), 2)
+            # Released once the meeting was ingested
+            self.assertIsNone(audio_cache.cached_audio(sha256, client_name))
+
+        self.assertCountEqual(self.rag, [(client, folder) for client, folder, _, _ in meetings])
+        # Every job found its spooled upload, including both clients of the shared recording
+        self.assertEqual(self.downloads, [])
+        self.assertEqual(len(self.asr.submitted), self.MEETINGS)
+        self.assertWorkspacesReleased()
+
+
+class WorkspaceQuotaTest(IngestionTestCase):
+    INGESTIONS = 6
+
+    def setUp(self):
+        self.peak_reserved = 0
+        self.peak_on_disk = 0
+        self._lock = threading.Lock()
+        self.asr = StandInAsr(on_submit=self.measure)
+        self.start_patches(self.asr.patches())
+        self.folders = [f"quota-test/2024-01-01/meeting_{i}" for i in range(self.INGESTIONS)]
+        for i, folder in enumerate(self.folders):
+            # Not spooled, so every ingestion downloads its audio into the workspace
+            KapNotes.blob_store.write_text(f"{folder}/audio.wav", f"quota {i}\n" + "x" * AUDIO_BYTES)
+
+    def measure(self, audio_path):
+        with self._lock:
+            self.peak_reserved = max(self.peak_reserved, KapNotes.workspaces.usage())
+            self.peak_on_disk = max(self.peak_on_disk, disk_usage(os.environ["WORKSPACE_ROOT"]))
+        time.sleep(0.3)
+
+    def test_quota_holds_under_concurrent_ingestions(self):
+        def ingest(folder):
+            try:
+                return KapNotes.start_ingestion("quota-test", folder, "audio.wav")
+            except WorkspaceQuotaExceeded as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=self.INGESTIONS) as pool:
+            results = list(pool.map(ingest, self.folders))
+
+        quota = KapNotes.workspaces.quota_bytes
+        rejected = [r for r in results if isinstance(r, WorkspaceQuotaExceeded)]
+        self.assertLessEqual(self.peak_reserved, quota)
+        self.assertLessEqual(self.peak_on_disk, quota)
+        # Two recordings fit; the others must fail rather than run without their audio
+        self.assertGreaterEqual(len(self.asr.submitted), 1)
+        self.assertGreaterEqual(len(rejected), 1)
+        self.assertEqual(len(self.asr.submitted) + len(rejected), self.INGESTIONS)
+        self.assertWorkspacesReleased()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Per-stage latency percentiles from the span file written by tracing.py.
+
+    python trace_summary.py                      # all spans in traces.jsonl
+    python trace_summary.py --since 24h          # only spans started in the last day
+    python trace_summary.py --trace <trace_id>   # every span of one upload, in order
+"""
+import sys
+import json
+import math
+import time
+import argparse
+from collections import defaultdict
+
+from tracing import TRACE_FILE
+
+UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def load_spans(path, since=None):
+    spans = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if since and (record.get("start") or 0) < since:
+                continue
+            spans.append(record)
+    return spans
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, math.ceil(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(spans):
+    durations = defaultdict(list)
+    errors = defaultdict(int)
+    for record in spans:
+        durations[record["span"]].append(record["duration"])
+        if record.get("status") == "error":
+            errors[record["span"]] += 1
+
+    print(f"{'span':<22} {'count':>6} {'errors':>6} {'p50 s':>9} {'p90 s':>9} {'p99 s':>9} {'max s':>9}")
+    for name in sorted(durations, key=lambda n: -sorted(durations[n])[len(durations[n]) // 2]):
+        values = sorted(durations[name])
+        print(f"{name:<22} {len(values):>6} {errors[name]:>6} {percentile(values, 50):>9.2f} "
+              f"{percentile(values, 90):>9.2f} {percentile(values, 99):>9.2f} {values[-1]:>9.2f}")
+
+
+def show_trace(spans, trace_id):
+    selected = sorted((s for s in spans if s["trace_id"] == trace_id), key=lambda s: s.get("start") or 0)
+    if not selected:
+        print(f"No spans for trace {trace_id}", file=sys.stderr)
+        return
+    origin = min(s["start"] for s in selected if s.get("start")) if any(s.get("start") for s in selected) else 0
+    for record in selected:
+        offset = f"+{record['start'] - origin:8.2f}s" if record.get("start") else " " * 10
+        extra = {k: v for k, v in record.items() if k not in ("trace_id", "span", "start", "duration")}
+        print(f"{offset} {record['span']:<22} {record['duration']:>9.2f}s {json.dumps(extra) if extra else ''}")
+
+
+def parse_since(text):
+    if not text:
+        return None
+    return time.time() - float(text[:-1]) * UNITS[text[-1]] if text[-1] in UNITS else float(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency percentiles per pipeline stage.")
+    parser.add_argument("--file", default=TRACE_FILE)
+    parser.add_argument("--since", help="e.g. 30m, 24h, 7d, or a unix timestamp")
+    parser.add_argument("--trace", help="show the spans of one trace id")
+    args = parser.parse_args()
+
+    spans = load_spans(args.file, parse_since(args.since))
+    if args.trace:
+        show_trace(spans, args.trace)
+    else:
+        summarize(spans)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Carries the trace id to ASR and ConvEng
+TRACE_HEADER = "X-Trace-Id"
+# One JSON span per line; summarize with trace_summary.py
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_write_lock = threading.Lock()
+
+
+def new_trace_id():
+    return uuid.uuid4().hex
+
+
+def current_trace_id():
+    return _trace_id.get()
+
+
+@contextmanager
+def trace(trace_id):
+    """Make trace_id current for spans recorded in this context."""
+    token = _trace_id.set(trace_id)
+    try:
+        yield trace_id
+    finally:
+        _trace_id.reset(token)
+
+
+def trace_headers():
+    trace_id = current_trace_id()
+    return {TRACE_HEADER: trace_id} if trace_id else {}
+
+
+def record_span(name, duration, start=None, trace_id=None, **attrs):
+    """Append one span to TRACE_FILE; spans outside a trace are dropped."""
+    trace_id = trace_id or current_trace_id()
+    if trace_id is None:
+        return
+    record = {"trace_id": trace_id, "span": name, "start": start, "duration": round(duration, 4), **attrs}
+    line = json.dumps(record, default=str)
+    with _write_lock:
+        with open(TRACE_FILE, "a") as f:
+            f.write(line + "\n")
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time the enclosed block as a span of the current trace."""
+    start = time.time()
+    status = "ok"
+    try:
+        yield attrs
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        record_span(name, time.time() - start, start=start, status=status, **attrs)
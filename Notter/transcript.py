@@ -0,0 +1,100 @@
+import functools
+import tiktoken
+
+OMITTED_MARKER = "[... {count} lines omitted to fit the token budget ...]"
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+def count_tokens(text, model="gpt-4o"):
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+def merge_segments(segments):
+    """Collapse consecutive segments from the same speaker, dropping word-level data."""
+    merged = []
+    for seg in segments:
+        text = seg.get("text", "").strip()
+        if not text:
+            continue
+        speaker = seg.get("speaker", "UNKNOWN")
+        if merged and merged[-1]["speaker"] == speaker:
+            merged[-1]["text"] += " " + text
+            merged[-1]["end"] = seg.get("end", merged[-1]["end"])
+        else:
+            merged.append({"speaker": speaker, "start": seg.get("start"), "end": seg.get("end"), "text": text})
+    return merged
+
+
+def render_lines(merged):
+    return [f"{seg['speaker']}: {seg['text']}" for seg in merged]
+
+
+def transcript_lines(segments):
+    return render_lines(merge_segments(segments))
+
+
+def split_line(line, max_tokens, model="gpt-4o"):
+    """Cut a line longer than max_tokens into token slices, repeating its ``Speaker:`` label on each."""
+    encoding = get_encoding(model)
+    if len(encoding.encode(line, disallowed_special=())) <= max_tokens:
+        return [line]
+    speaker, sep, text = line.partition(": ")
+    label = speaker + sep if sep else ""
+    body = encoding.encode(text if sep else line, disallowed_special=())
+    room = max(1, max_tokens - len(encoding.encode(label, disallowed_special=())))
+    return [label + encoding.decode(body[i:i + room]) for i in range(0, len(body), room)]
+
+
+def split_windows(lines, window_tokens, model="gpt-4o"):
+    """Group consecutive lines into windows of at most window_tokens each, splitting lines that alone are longer."""
+    windows, current, used = [], [], 0
+    # A merged monologue can be one line longer than any window
+    pieces = (piece for line in lines for piece in split_line(line, window_tokens - 1, model))
+    for line in pieces:
+        cost = count_tokens(line, model) + 1
+        if current and used + cost > window_tokens:
+            windows.append("\n".join(current))
+            current, used = [], 0
+        current.append(line)
+        used += cost
+    if current:
+        windows.append("\n".join(current))
+    return windows
+
+
+def fit_to_budget(lines, budget, model="gpt-4o"):
+    """Keep as many lines as fit, taking from both ends so the opening and the wrap-up survive."""
+    costs = [count_tokens(line, model) + 1 for line in lines]
+    if sum(costs) <= budget:
+        return lines
+
+    head, tail = [], []
+    used = count_tokens(OMITTED_MARKER.format(count=len(lines)), model) + 1
+    i, j = 0, len(lines) - 1
+    while i <= j:
+        take_head = len(head) <= len(tail)
+        index = i if take_head else j
+        if used + costs[index] > budget:
+            break
+        used += costs[index]
+        if take_head:
+            head.append(lines[i])
+            i += 1
+        else:
+            tail.append(lines[j])
+            j -= 1
+    omitted = len(lines) - len(head) - len(tail)
+    return head + [OMITTED_MARKER.format(count=omitted)] + tail[::-1]
+
+
+def compact_transcript(segments, budget, model="gpt-4o"):
+    """Render ASR segments as compact ``Speaker: text`` lines within a token budget."""
+    lines = fit_to_budget(transcript_lines(segments), budget, model)
+    return "\n".join(lines)
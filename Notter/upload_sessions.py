@@ -0,0 +1,229 @@
+import os
+import json
+import shutil
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+import audio_cache
+
+# Parts are kept in the bucket under a hidden folder until the upload completes
+PARTS_PREFIX = ".uploads"
+MAX_PART_SIZE = 16 * 1024 * 1024
+# Enough for ~50 GB in the extension's 1 MB parts, or ~14 hours of its 1 s live chunks
+MAX_PARTS = 50000
+# Live chunks are numbered by the second (MediaRecorder timeslice), so the longest meeting bounds them
+LIVE_CHUNK_SECONDS = 1
+MAX_LIVE_MEETING_HOURS = float(os.getenv("MAX_LIVE_MEETING_HOURS", 12))
+MAX_LIVE_CHUNKS = min(MAX_PARTS, int(MAX_LIVE_MEETING_HOURS * 3600 / LIVE_CHUNK_SECONDS))
+
+
+class UploadError(ValueError):
+    pass
+
+
+def missing_parts(received, total_parts):
+    """Part numbers in 1..total_parts absent from the sorted received list, found from the gaps between them."""
+    missing, expected = [], 1
+    for part_number in received:
+        if part_number > total_parts:
+            break
+        missing.extend(range(expected, part_number))
+        expected = part_number + 1
+    missing.extend(range(expected, total_parts + 1))
+    return missing
+
+
+class UploadSessions:
+    """Multipart uploads from the extension: open a session, send numbered parts, then complete.
+
+    Each part is written to a local staging file and to its own object in
+    the bucket, so a part can be retried or sent alongside others and a
+    dropped connection only costs the parts that did not arrive. On
+    completion the staged parts are concatenated into the audio cache,
+    hashed for duplicate detection, and composed into the final object in
+    storage without uploading the recording a second time.
+
+    A live session, opened while a meeting is still being recorded, takes
+    parts without a known total; seal() fixes the count when the recording
+    stops and turns it into an ordinary open session.
+    """
+
+    def __init__(self, db_path, store, staging_dir=None):
+        self.store = store
+        self.staging_dir = Path(staging_dir or audio_cache.AUDIO_CACHE_DIR / "parts")
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS upload_sessions (
+                upload_id TEXT PRIMARY KEY,
+                client_name TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                content_type TEXT,
+                suffix TEXT NOT NULL,
+                total_parts INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                result TEXT,
+                trace_id TEXT,
+                created_at TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS upload_parts (
+                upload_id TEXT NOT NULL,
+                part_number INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                PRIMARY KEY (upload_id, part_number)
+            )"""
+        )
+        self._conn.commit()
+
+    def _part_name(self, upload_id, part_number):
+        return f"{PARTS_PREFIX}/{upload_id}/{part_number:05d}"
+
+    def _part_path(self, upload_id, part_number):
+        return self.staging_dir / upload_id / f"{part_number:05d}.part"
+
+    def create(self, client_name, metadata, content_type, suffix, total_parts, trace_id=None, live=False):
+        if (total_parts < 1 and not live) or total_parts > MAX_PARTS:
+            raise UploadError(f"totalChunks must be between 1 and {MAX_PARTS}")
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO upload_sessions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (upload_id, client_name, json.dumps(metadata), content_type, suffix,
+                 0 if live else total_parts, "live" if live else "open", None, trace_id,
+                 datetime.now().isoformat())
+            )
+            self._conn.commit()
+        return upload_id
+
+    def get(self, upload_id):
+        """Session with the part numbers received so far and the ones still missing, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM upload_sessions WHERE upload_id = ?", (upload_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            parts = self._conn.execute(
+                "SELECT part_number, size FROM upload_parts WHERE upload_id = ? ORDER BY part_number",
+                (upload_id,)
+            ).fetchall()
+        session = dict(row)
+        session["metadata"] = json.loads(session["metadata"])
+        session["result"] = json.loads(session["result"]) if session["result"] else None
+        received = [part["part_number"] for part in parts]
+        session["received"] = received
+        session["missing"] = missing_parts(received, session["total_parts"])
+        session["received_bytes"] = sum(part["size"] for part in parts)
+        return session
+
+    def put_part(self, upload_id, part_number, data):
+        """Stage one part locally and in the bucket; sending the same part again replaces it."""
+        session = self.get(upload_id)
+        if session is None:
+            raise KeyError(upload_id)
+        live = session["status"] == "live"
+        if session["status"] not in ("open", "live"):
+            raise UploadError(f"Upload is {session['status']}")
+        limit = MAX_LIVE_CHUNKS if live else session["total_parts"]
+        if part_number < 1 or part_number > limit:
+            raise UploadError(f"Part number must be between 1 and {limit}")
+        if len(data) > MAX_PART_SIZE:
+            raise UploadError(f"Parts are limited to {MAX_PART_SIZE} bytes")
+
+        path = self._part_path(upload_id, part_number)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        temp_path.write_bytes(data)
+        temp_path.replace(path)
+        self.store.upload_file(self._part_name(upload_id, part_number), path, "application/octet-stream")
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO upload_parts VALUES (?, ?, ?)",
+                (upload_id, part_number, len(data))
+            )
+            if live:
+                self._conn.execute(
+                    "UPDATE upload_sessions SET total_parts = MAX(total_parts, ?) WHERE upload_id = ?",
+                    (part_number, upload_id)
+                )
+            self._conn.commit()
+        return len(data)
+
+    def seal(self, upload_id, total_parts, metadata=None):
+        """Fix a live session's part count, and optionally its metadata, once recording stops."""
+        if total_parts < 1 or total_parts > MAX_LIVE_CHUNKS:
+            raise UploadError(f"totalChunks must be between 1 and {MAX_LIVE_CHUNKS}")
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE upload_sessions SET status = 'open', total_parts = ?, metadata = COALESCE(?, metadata) "
+                "WHERE upload_id = ? AND status = 'live'",
+                (total_parts, json.dumps(metadata) if metadata is not None else None, upload_id)
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def assemble(self, session):
+        """Concatenate a complete session's parts into the audio cache; returns (sha256, path)."""
+        if session["missing"]:
+            raise UploadError(f"{len(session['missing'])} parts have not been received")
+        upload_id = session["upload_id"]
+        paths = []
+        for part_number in range(1, session["total_parts"] + 1):
+            path = self._part_path(upload_id, part_number)
+            if not path.exists():
+                # Staging was cleared since the part arrived; it is still in the bucket
+                path.parent.mkdir(parents=True, exist_ok=True)
+                self.store.download_file(self._part_name(upload_id, part_number), path)
+            paths.append(path)
+        return audio_cache.assemble_to_cache(paths, session["suffix"], session["client_name"])
+
+    def compose(self, session, blob_name):
+        """Compose the parts into blob_name in storage; returns its URL."""
+        names = [self._part_name(session["upload_id"], n) for n in range(1, session["total_parts"] + 1)]
+        return self.store.compose(names, blob_name, session["content_type"])
+
+    def _discard_parts(self, upload_id, total_parts):
+        shutil.rmtree(self.staging_dir / upload_id, ignore_errors=True)
+        self.store.delete_many([self._part_name(upload_id, n) for n in range(1, total_parts + 1)])
+        with self._lock:
+            self._conn.execute("DELETE FROM upload_parts WHERE upload_id = ?", (upload_id,))
+            self._conn.commit()
+
+    def finish(self, session, result):
+        """Record the completed upload's response, so a retried complete gets the same answer."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE upload_sessions SET status = 'completed', result = ? WHERE upload_id = ?",
+                (json.dumps(result), session["upload_id"])
+            )
+            self._conn.commit()
+        self._discard_parts(session["upload_id"], session["total_parts"])
+
+    def abort(self, upload_id):
+        session = self.get(upload_id)
+        if session is None or session["status"] not in ("open", "live"):
+            return False
+        with self._lock:
+            self._conn.execute(
+                "UPDATE upload_sessions SET status = 'aborted' WHERE upload_id = ?", (upload_id,)
+            )
+            self._conn.commit()
+        self._discard_parts(upload_id, session["total_parts"])
+        return True
+
+    def abort_stale(self, max_age):
+        """Abort open sessions older than max_age; returns how many were dropped."""
+        cutoff = (datetime.now() - max_age).isoformat()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT upload_id FROM upload_sessions WHERE status IN ('open', 'live') AND created_at < ?", (cutoff,)
+            ).fetchall()
+        return sum(self.abort(row["upload_id"]) for row in rows)
@@ -0,0 +1,67 @@
+import os
+import re
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+
+
+class WorkspaceQuotaExceeded(RuntimeError):
+    pass
+
+
+class Workspace:
+    """Scratch directory owned by a single ingestion job."""
+
+    def __init__(self, manager, path):
+        self.manager = manager
+        self.path = Path(path)
+        self.reserved = 0
+
+    def file(self, name):
+        return self.path / name
+
+    def reserve(self, nbytes):
+        """Claim disk space before writing; raises if the shared quota would be exceeded."""
+        self.manager._reserve(self, nbytes)
+
+    def account(self, file_path):
+        """Claim the space of a file already written into the workspace."""
+        self.reserve(os.path.getsize(file_path))
+
+
+class WorkspaceManager:
+    """Hands out per-job scratch directories under one root with a shared disk quota."""
+
+    def __init__(self, root, quota_bytes):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.quota_bytes = quota_bytes
+        self._lock = threading.Lock()
+        self._reserved = 0
+
+    def _reserve(self, workspace, nbytes):
+        with self._lock:
+            if self._reserved + nbytes > self.quota_bytes:
+                raise WorkspaceQuotaExceeded(
+                    f"Workspace quota exceeded: {self._reserved + nbytes} > {self.quota_bytes} bytes"
+                )
+            self._reserved += nbytes
+            workspace.reserved += nbytes
+
+    def usage(self):
+        with self._lock:
+            return self._reserved
+
+    @contextmanager
+    def workspace(self, name):
+        """Create an isolated directory for one job and remove it, with its quota, afterwards."""
+        prefix = re.sub(r"[^A-Za-z0-9_.-]", "_", name) + "_"
+        workspace = Workspace(self, tempfile.mkdtemp(prefix=prefix, dir=self.root))
+        try:
+            yield workspace
+        finally:
+            shutil.rmtree(workspace.path, ignore_errors=True)
+            with self._lock:
+                self._reserved -= workspace.reserved
@@ -1,59 +1,59 @@
 import os
+import sys
 import json
 import re
 import html
 import streamlit as st
 import plotly.graph_objects as go
-from google.cloud import storage
 from google.oauth2 import service_account
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from scipy.ndimage import gaussian_filter1d
 from datetime import timedelta, datetime
+
+# Same storage layer as Notter, so the dashboard also runs against STORAGE_BACKEND=local
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "Notter"))
+from blob_store import get_blob_store
+from summary_schema import format_action_item
  
-gcp_credentials = os.getenv('GCP_CREDENTIALS')
-credentials_dict = json.loads(gcp_credentials)
-creds = service_account.Credentials.from_service_account_info(credentials_dict)
-client = storage.Client(credentials=creds)
-bucket_name = "kapnotes"
-bucket = client.bucket(bucket_name)
+creds = None
+if os.getenv("STORAGE_BACKEND", "gcs") == "gcs":
+    gcp_credentials = os.getenv('GCP_CREDENTIALS')
+    credentials_dict = json.loads(gcp_credentials)
+    creds = service_account.Credentials.from_service_account_info(credentials_dict)
+blob_store = get_blob_store(creds)
 st.set_page_config(page_title="Kap Notes", layout="wide")
 
+def list_folders(prefix):
+    # Delimiter listing returns only the immediate sub-folders, not every blob below them
+    return blob_store.list_prefixes(prefix)
+
 def get_client_names():
-    blobs = list(bucket.list_blobs(prefix=""))
-    client_names = set()
-    for blob in blobs:
-        client_name = blob.name.split("/")[0]
-        client_names.add(client_name)
-    return sorted(client_names)
+    return list_folders("")
+
+def find_audio_blob(client_name, date, meeting):
+    # Audio is stored in its original format (audio.webm, audio.wav, ...)
+    for info in blob_store.list(f"{client_name}/{date}/{meeting}/audio."):
+        return info
+    return None
 
 def validate_data(client_name, date, meeting):
     summary_blob_name = f"{client_name}/{date}/{meeting}/summary.txt"
     transcription_blob_name = f"{client_name}/{date}/{meeting}/transcription.txt"
-    audio_blob_name = f"{client_name}/{date}/{meeting}/audio.wav"
-    summary_blob = bucket.blob(summary_blob_name)
-    transcription_blob = bucket.blob(transcription_blob_name)
-    audio_blob = bucket.blob(audio_blob_name)
-    return summary_blob.exists() and transcription_blob.exists() and audio_blob.exists()
+    return blob_store.exists(summary_blob_name) and blob_store.exists(transcription_blob_name) and find_audio_blob(client_name, date, meeting) is not None
+
+def parse_summary_text(summary_content):
+    """Summary, key points and action items from a summary.txt written before summary.json existed."""
+    summary_match = re.search(r"Summary:\s*(.*?)(?=\nKey Points:)", summary_content, re.DOTALL)
+    key_points_match = re.search(r"Key Points:\s*(.*?)(?=\nAction Items:)", summary_content, re.DOTALL)
+    action_items_match = re.search(r"Action Items:\s*(.*)", summary_content, re.DOTALL)
+    summary = summary_match.group(1).strip() if summary_match else None
+    key_points = re.findall(r"- (.*?)\n", key_points_match.group(1)) if key_points_match else []
+    action_items = re.findall(r"- (.*?)(?=\n- |$)", action_items_match.group(1), re.DOTALL) if action_items_match else []
+    return summary, key_points, action_items
 
 def get_meetings_for_date(client_name, date):
-    prefix = f"{client_name}/{date}/"
-    blobs = list(bucket.list_blobs(prefix=prefix))
-    meetings = set()
-    for blob in blobs:
-        parts = blob.name.split("/")
-        if len(parts) > 2 and parts[2]:
-            meetings.add(parts[2])
-    return sorted(meetings)
+    return list_folders(f"{client_name}/{date}/")
 
 def get_dates_for_client(client_name):
-    prefix = f"{client_name}/"
-    blobs = list(bucket.list_blobs(prefix=prefix))
-    dates = set()
-    for blob in blobs:
-        parts = blob.name.split("/")
-        if len(parts) > 1 and parts[1]:
-            dates.add(parts[1])
-    return sorted(dates)
+    return list_folders(f"{client_name}/")
 
 def login():
     st.markdown("""
@@ -358,59 +358,44 @@ else:
     st.markdown(css, unsafe_allow_html=True)
 
     summary_blob_name = f"{client_name}/{date}/{meeting}/summary.txt"
+    summary_json_blob_name = f"{client_name}/{date}/{meeting}/summary.json"
     transcription_blob_name = f"{client_name}/{date}/{meeting}/transcription.txt" 
-    audio_blob_name = f"{client_name}/{date}/{meeting}/audio.wav"
-
-    bucket = client.bucket(bucket_name)
-
-    summary_blob = bucket.blob(summary_blob_name)
-    summary_content = summary_blob.download_as_text()
-
-    audio_blob = bucket.blob(audio_blob_name)
-    audio_url = audio_blob.generate_signed_url(expiration=timedelta(hours=1), method='GET')
-
-    summary_match = re.search(r"Summary:\s*(.*?)(?=\nKey Points:)", summary_content, re.DOTALL)
-    summary = summary_match.group(1).strip() if summary_match else "Summary not found."
-
-    key_points_match = re.search(r"Key Points:\s*(.*?)(?=\nAction Items:)", summary_content, re.DOTALL)
-    key_points = re.findall(r"- (.*?)\n", key_points_match.group(1)) if key_points_match else ["Key points not found."]
-
-    action_items_match = re.search(r"Action Items:\s*(.*)", summary_content, re.DOTALL)
-    if action_items_match:
-        action_items = re.findall(r"- (.*?)(?=\n- |$)", action_items_match.group(1), re.DOTALL)
+    analytics_blob_name = f"{client_name}/{date}/{meeting}/analytics.json"
+
+    audio_blob = find_audio_blob(client_name, date, meeting)
+    audio_url = blob_store.url(audio_blob.name, expiration=timedelta(hours=1))
+    audio_type = (audio_blob.content_type or "audio/wav").split(";")[0]
+
+    # Notes are stored as structured fields; meetings from before summary.json show their text as-is
+    if blob_store.exists(summary_json_blob_name):
+        notes = json.loads(blob_store.read_text(summary_json_blob_name))
+        summary = notes["summary"]
+        key_points = notes["key_points"]
+        action_items = [format_action_item(item) for item in notes["action_items"]]
+        placeholders = ("No key points.", "No action items.")
     else:
-        action_items = ["Action items not found."]
-
-    transcription_blob = bucket.blob(transcription_blob_name)
-    with transcription_blob.open("r") as file:
+        summary_content = blob_store.read_text(summary_blob_name)
+        summary, key_points, action_items = parse_summary_text(summary_content)
+        # Text that doesn't follow the layout is shown as-is
+        summary = summary or summary_content
+        action_items = [item.strip() for item in action_items]
+        placeholders = ("Reprocess this meeting to see its key points.",
+                        "Reprocess this meeting to see its action items.")
+    # The notes are LLM output and go into HTML below, so escape them whichever file they came from
+    summary = html.escape(summary).replace("\n", "<br>")
+    key_points = [html.escape(point) for point in key_points] or [placeholders[0]]
+    action_items = [html.escape(item) for item in action_items] or [placeholders[1]]
+
+    # The transcript is still read for the chat view; nothing is computed from it here
+    with blob_store.open(transcription_blob_name, "r") as file:
         meeting_data = json.load(file)
 
-    speaker_data = {}
-    total_talktime = 0
-
-    for entry in meeting_data:
-        speaker = entry["speaker"]
-        duration = entry["end"] - entry["start"]
-        text = entry["text"]
-        total_talktime += duration
-
-        if speaker not in speaker_data:
-            speaker_data[speaker] = {"talktime": 0, "text": "", "words": 0}
-
-        speaker_data[speaker]["talktime"] += duration
-        speaker_data[speaker]["text"] += " " + text
-        speaker_data[speaker]["words"] += len(text.split())
-
-    for speaker, data in speaker_data.items():
-        data["word_per_minute"] = round((data["words"] / data["talktime"] * 60), 2)
-        data["talktime_percentage"] = round((data["talktime"] / total_talktime * 100), 2)
-
-    combined_text = " ".join(data["text"] for data in speaker_data.values())
-
-    analyzer = SentimentIntensityAnalyzer()
-    sentences = combined_text.split('.')
-    sentiment_polarity = [analyzer.polarity_scores(sentence)["compound"] for sentence in sentences if sentence.strip()]
-    smoothed_polarity = gaussian_filter1d(sentiment_polarity, sigma=2)
+    # Talk time, words per minute and sentiment are computed once at ingest by Notter
+    analytics = None
+    if blob_store.exists(analytics_blob_name):
+        analytics = json.loads(blob_store.read_text(analytics_blob_name))
+    speaker_data = {s["name"]: s for s in analytics["speakers"]} if analytics else {}
+    smoothed_polarity = analytics["sentiment"] if analytics else []
 
     st.title("Kap Notes - Unveiling the story behind your meeting")
 
@@ -471,6 +456,9 @@ else:
 
     with st.sidebar:
 
+        if analytics is None:
+            st.info("Analytics for this meeting are not computed yet. Run `python reprocess.py --stages analytics` in Notter.")
+
         speaker_names = list(speaker_data.keys())
         talk_time_percentages = [data["talktime_percentage"] for data in speaker_data.values()]
 
@@ -481,7 +469,7 @@ else:
         <div class="audio-player-container">
             <h4>Listen to the Meeting Audio</h4>
             <audio class="audio-player" controls>
-                <source src="{audio_url}" type="audio/wav">
+                <source src="{audio_url}" type="{audio_type}">
                 Your browser does not support the audio element.
             </audio>
         </div>
@@ -495,7 +483,7 @@ else:
                 speaker = entry["speaker"]
                 text = entry["text"]
                 talk_time = entry["end"] - entry["start"]
-                speaker_color = speaker_colors[speaker]
+                speaker_color = speaker_colors.get(speaker, color_palette[0])
                 chat_conversation += f"""
                 <div style="margin-bottom: 20px; background-color: {speaker_color}; padding: 15px; 
                             border-radius: 10px; box-shadow: 0px 4px 6px rgba(0, 0, 0, 0.1);">